@@ -1,67 +1,366 @@
 import sqlite3
-import json
+import re
+from collections import defaultdict, deque
+from itertools import islice
 import datetime
 import time
-import schedule
+import random
 import threading
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Iterator, Iterable
+from dataclasses import dataclass, field
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-import uuid
+import sys
+from urllib.parse import urlencode, quote
+import binascii
 import configparser
+import queue
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import logging.handlers
+import atexit
+
+# Optional MySQL driver, only needed when a database is configured with Type = mysql
+try:
+    import mysql.connector
+    import mysql.connector.pooling
+except ImportError:
+    mysql = None
+
+_b64encode = binascii.b2a_base64
+
+# Per-record messages go through this logger, console output stays on print
+logger = logging.getLogger("bridge")
+
+def setupLogging(level: int = logging.WARNING):
+    # Format and write records on a listener thread so sync threads only enqueue them
+    logQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    # The record's own timestamp, messages no longer format the time themselves
+    handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+    listener = logging.handlers.QueueListener(logQueue, handler)
+    logger.addHandler(logging.handlers.QueueHandler(logQueue))
+    logger.setLevel(level)
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+# SQL STATEMENTS
+# Hot statements are kept as constant text so the driver's statement cache can reuse them
+# Log inserts carry many rows per statement, the VALUES list is appended per chunk size
+_SQL_INSERT_LOG_COLUMNS = '''
+    INTO accesslogs
+    (id, cardid, datetime, terminalid, terminalip, doorid, termdoor,
+     in_out, verifysource, funckey, verifystatus, eventcode, userid)
+    VALUES '''
+_SQL_INSERT_LOG = "INSERT OR IGNORE" + _SQL_INSERT_LOG_COLUMNS
+_SQL_INSERT_LOG_MYSQL = "INSERT IGNORE" + _SQL_INSERT_LOG_COLUMNS
+_SQL_LOG_ROW = "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+@lru_cache(maxsize=128)
+def _multiRowSql(prefix: str, rowSql: str, count: int) -> str:
+    # Same text for the same row count, built once and then hit in the connection's statement cache
+    return prefix + ", ".join([rowSql] * count)
+
+_SQL_SELECT_LAST_TS = 'SELECT last_synced_ts FROM terminalsa WHERE terminalid = ?'
+
+_SQL_UPDATE_LAST_TS = '''
+    UPDATE terminalsa
+    SET last_synced_ts = ?
+    WHERE terminalid = ? AND (last_synced_ts IS NULL OR last_synced_ts < ?)
+'''
+
+# The [DATETIME] column type makes SQLite hand back a datetime through the registered converter
+_SQL_MAX_DT_FROM = '''
+    FROM accesslogs
+    WHERE terminalid = ?
+'''
+_SQL_MAX_DT = 'SELECT MAX(datetime) as "max_dt [DATETIME]"' + _SQL_MAX_DT_FROM
+_SQL_MAX_DT_MYSQL = 'SELECT MAX(datetime) as max_dt' + _SQL_MAX_DT_FROM
+
+# accesslogs.datetime is stored as '%Y-%m-%d %H:%M:%S', built from a per-minute prefix
+_LOG_MINUTE_FORMAT = "%Y-%m-%d %H:%M:"
+
+# Formatted with one placeholder per id, full chunks share the same text
+_SQL_SELECT_FT = '''
+    SELECT id, userId FROM faceTemplates
+    WHERE userType = ? AND userId IN ({placeholders})
+'''
+
+_SQL_INSERT_FT_COLUMNS = '''
+    INTO faceTemplates (userId, userType, tableYear, syncedDevices)
+    VALUES (?, ?, ?, '[]')
+'''
+_SQL_INSERT_FT = "INSERT OR IGNORE" + _SQL_INSERT_FT_COLUMNS
+_SQL_INSERT_FT_MYSQL = "INSERT IGNORE" + _SQL_INSERT_FT_COLUMNS
+
+_SQL_SELECT_TEMPLATE_SYNC = 'SELECT templateId, deviceName FROM faceTemplateSync'
+# Only the sync rows of the devices being synced, one placeholder per device name
+_SQL_SELECT_TEMPLATE_SYNC_FOR = _SQL_SELECT_TEMPLATE_SYNC + ' WHERE deviceName IN ({placeholders})'
+
+_SQL_MARK_SYNCED_COLUMNS = ' INTO faceTemplateSync (templateId, deviceName, syncedAt) VALUES (?, ?, ?)'
+_SQL_MARK_SYNCED = "INSERT OR IGNORE" + _SQL_MARK_SYNCED_COLUMNS
+_SQL_MARK_SYNCED_MYSQL = "INSERT IGNORE" + _SQL_MARK_SYNCED_COLUMNS
+
+_SQL_INSERT_SYNC_LOG = '''
+    INSERT INTO syncLogs (syncType, deviceName, recordsSynced, status, errorMessage, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# Status counters, one round trip per database
+_SQL_CMS_COUNTS = '''
+    SELECT (SELECT COUNT(*) FROM student),
+           (SELECT COUNT(*) FROM new_employee),
+           (SELECT COUNT(*) FROM faceTemplates)
+'''
+_SQL_NOBLE_COUNTS = 'SELECT (SELECT COUNT(*) FROM accesslogs), (SELECT COUNT(*) FROM syncLogs)'
+
+def _chunked(items: List, size: int):
+    # Yield successive slices of at most `size` items
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@lru_cache(maxsize=4096)
+def _log_minute_prefix(minute: int) -> str:
+    # Local "YYYY-mm-dd HH:MM:" for a minute since the epoch, shared by every device and batch
+    return time.strftime(_LOG_MINUTE_FORMAT, time.localtime(minute * 60))
+
+def _convert_datetime(value):
+    # '%Y-%m-%d %H:%M:%S' text to datetime, None for zero dates or anything unparseable
+    if isinstance(value, bytes):
+        value = value.decode()
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+sqlite3.register_converter("DATETIME", _convert_datetime)
+
+# SQLITE CONNECTION POOL
+class SQLitePool:
+    # Small queue-backed pool of long-lived SQLite connections
+    CACHED_STATEMENTS = 256
+    PRAGMAS = '''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+        PRAGMA busy_timeout=30000;
+    '''
+
+    def __init__(self, path: str, poolSize: int = 10):
+        self.path = path
+        self._idle = queue.Queue(maxsize=poolSize)
+
+    def _connect(self):
+        # Connections are handed between threads, PRAGMAs are applied once per connection
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=self.CACHED_STATEMENTS,
+                               detect_types=sqlite3.PARSE_COLNAMES)
+        conn.executescript(self.PRAGMAS)
+        # Rows are read by column name, the same way as MySQL dict cursors
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get_connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def put(self, conn):
+        # Drop any unfinished transaction before reuse
+        conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def closeAll(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# Backend specific helpers, bound once per DatabaseManager
+def _sqlite_cursor(conn):
+    return conn.cursor()
+
+def _mysql_cursor(conn):
+    return conn.cursor(dictionary=True)
+
+def _mysql_stream_cursor(conn):
+    # Unbuffered so large scans are pulled from the server batch by batch
+    return conn.cursor(dictionary=True, buffered=False)
+
+def _iter_rows(cursor, size):
+    # Stream a result set in fetchmany() batches instead of fetchall()
+    while True:
+        batch = cursor.fetchmany(size)
+        if not batch:
+            break
+        yield from batch
+
+def _sqlite_row_to_dict(row):
+    return dict(row)
+
+def _mysql_row_to_dict(row):
+    return row
+
+def _sqlite_begin_write(cursor):
+    # Take the write lock up front instead of upgrading a deferred transaction mid-batch
+    cursor.execute('BEGIN IMMEDIATE')
+
+def _mysql_begin_write(cursor):
+    # Connector runs with autocommit off, the first statement opens the transaction
+    pass
+
+def _close_connection(conn):
+    # Pooled MySQL connections go back to their pool on close()
+    conn.close()
+
+def _close_mysql_pool(pool):
+    # The connector has no public close for a pool, so drain it through get_connection() and
+    # disconnect each connection instead of close(), which would only hand it back to the pool
+    drained = []
+    for _ in range(pool.pool_size):
+        try:
+            drained.append(pool.get_connection())
+        except mysql.connector.errors.PoolError:
+            break
+        except mysql.connector.Error as e:
+            logger.warning("Could not drain a connection from MySQL pool %s: %s", pool.pool_name, e)
+    for conn in drained:
+        try:
+            conn.disconnect()
+        except mysql.connector.Error as e:
+            logger.warning("Error disconnecting MySQL pool %s connection: %s", pool.pool_name, e)
+
+_LOCK_RETRIES = 5
+_LOCK_RETRY_DELAY = 0.05
+
+def _retryOnLocked(fn):
+    # Retry a write that still found SQLite locked after busy_timeout, backing off exponentially
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(_LOCK_RETRIES - 1):
+            try:
+                return fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                delay = _LOCK_RETRY_DELAY * 2 ** attempt
+                logger.warning("%s: database locked, retrying in %.2fs", fn.__name__, delay)
+                time.sleep(delay)
+        return fn(*args, **kwargs)
+    return wrapper
 
 class DatabaseManager:
+    POOL_SIZE = 10
+    # Bound variables per statement on SQLite older than 3.32, every statement stays within it
+    SQLITE_MAX_VARS = 999
+    # IN-list size for bucketed lookups, one bound parameter is left for userType
+    FETCH_CHUNK_SIZE = 900
+    STREAM_BATCH_SIZE = 1024
+    # Log rows per multi-row INSERT, as many as fit in the variable limit at 13 parameters each
+    LOG_INSERT_ROWS = SQLITE_MAX_VARS // _SQL_LOG_ROW.count("?")
+
     def __init__(self, nobleConfig: Dict, cmsConfig: Dict):
         self.nobleConfig = nobleConfig
         self.cmsConfig = cmsConfig
+        self._noble_is_mysql = nobleConfig['type'] == "mysql"
+        self._cms_is_mysql = cmsConfig['type'] == "mysql"
+        self._noble_pool = self._createPool(nobleConfig, "noble_pool")
+        self._cms_pool = self._createPool(cmsConfig, "cms_pool")
+        # syncLogs rows waiting for flushSyncLogs, appended from any thread
+        self._syncLogBuffer = deque()
+
+        # Resolve backend specific behaviour once instead of checking the type on every call
+        self._open_noble = self._noble_pool.get_connection
+        self._open_cms = self._cms_pool.get_connection
+        self._release_noble = _close_connection if self._noble_is_mysql else self._noble_pool.put
+        self._release_cms = _close_connection if self._cms_is_mysql else self._cms_pool.put
+        self._close_noble_pool = (lambda: _close_mysql_pool(self._noble_pool)) if self._noble_is_mysql else self._noble_pool.closeAll
+        self._close_cms_pool = (lambda: _close_mysql_pool(self._cms_pool)) if self._cms_is_mysql else self._cms_pool.closeAll
+        self._noble_cursor = _mysql_cursor if self._noble_is_mysql else _sqlite_cursor
+        self._cms_cursor = _mysql_cursor if self._cms_is_mysql else _sqlite_cursor
+        self._cms_stream_cursor = _mysql_stream_cursor if self._cms_is_mysql else _sqlite_cursor
+        self._row_to_dict = _mysql_row_to_dict if self._noble_is_mysql else _sqlite_row_to_dict
+        self._begin_noble_write = _mysql_begin_write if self._noble_is_mysql else _sqlite_begin_write
+        self._sql_insert_log = _SQL_INSERT_LOG_MYSQL if self._noble_is_mysql else _SQL_INSERT_LOG
+        # Full chunks are the common case, their statement text is built once
+        self._sql_insert_log_full = _multiRowSql(self._sql_insert_log, _SQL_LOG_ROW, self.LOG_INSERT_ROWS)
+        self._sql_insert_ft = _SQL_INSERT_FT_MYSQL if self._cms_is_mysql else _SQL_INSERT_FT
+        self._sql_mark_synced = _SQL_MARK_SYNCED_MYSQL if self._cms_is_mysql else _SQL_MARK_SYNCED
+        self._sql_max_dt = _SQL_MAX_DT_MYSQL if self._noble_is_mysql else _SQL_MAX_DT
+
         self.initDatabase()
-    
-    def get_noble_connection(self):
-        # Connection for Hardware/Logs DB (Noble)
-        dbType = self.nobleConfig['type']
-        if dbType == "mysql":
-            try:
-                import mysql.connector
-                return mysql.connector.connect(**self.nobleConfig['config'])
-            except ImportError:
+
+    def _createPool(self, dbConfig: Dict, poolName: str):
+        # One pool per database, connections are reused across calls
+        if dbConfig['type'] == "mysql":
+            if mysql is None:
                 print("Error: mysql-connector-python is required for MySQL but not installed.")
-                raise
+                raise ImportError("mysql-connector-python is not installed")
+            try:
+                return mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name=poolName, pool_size=self.POOL_SIZE, **dbConfig['config'])
             except Exception as e:
-                print(f"Error connecting to Noble MySQL: {e}")
+                print(f"Error creating {poolName} for MySQL: {e}")
                 raise
         else:
-            return sqlite3.connect(self.nobleConfig['path'])
+            return SQLitePool(dbConfig['path'], self.POOL_SIZE)
+    
+    def close(self):
+        # Write any buffered sync logs, then close the idle pooled connections, for shutdown
+        self.flushSyncLogs()
+        self._close_noble_pool()
+        self._close_cms_pool()
+
+    def get_noble_connection(self):
+        # Connection for Hardware/Logs DB (Noble)
+        return self._open_noble()
 
     def get_cms_connection(self):
         # Connection for Users/Business DB (CMS)
-        dbType = self.cmsConfig['type']
-        if dbType == "mysql":
-            try:
-                import mysql.connector
-                return mysql.connector.connect(**self.cmsConfig['config'])
-            except ImportError:
-                print("Error: mysql-connector-python is required for MySQL but not installed.")
-                raise
-            except Exception as e:
-                print(f"Error connecting to CMS MySQL: {e}")
-                raise
-        else:
-            return sqlite3.connect(self.cmsConfig['path'])
+        return self._open_cms()
 
-    def _get_cursor(self, conn, dbType):
-        if dbType == "mysql":
-             return conn.cursor(dictionary=True)
-        else:
-            # Note: Some methods in original code set row_factory manually
-            return conn.cursor()
+    def get_conn(self, database: str = "noble"):
+        # Pooled connection for "noble" or "cms", returned to the pool when the with block ends
+        if database == "cms":
+            return self._cms()
+        if database == "noble":
+            return self._noble()
+        raise ValueError(f"Unknown database: {database}")
+
+    @contextmanager
+    def _noble(self):
+        conn = self._open_noble()
+        try:
+            yield conn
+        finally:
+            self._release_noble(conn)
+
+    @contextmanager
+    def _cms(self):
+        conn = self._open_cms()
+        try:
+            yield conn
+        finally:
+            self._release_cms(conn)
 
     def initDatabase(self):
         # Initialize Noble Database (Hardware/Logs)
-        connNoble = self.get_noble_connection()
-        try:
-            cursorNoble = self._get_cursor(connNoble, self.nobleConfig['type'])
+        with self._noble() as connNoble:
+            cursorNoble = self._noble_cursor(connNoble)
             
             # Access logs table (accesslogs)
             cursorNoble.execute('''
@@ -105,9 +404,23 @@ class DatabaseManager:
                     logtotal INTEGER DEFAULT NULL,
                     relaystatus INTEGER DEFAULT -1,
                     username VARCHAR(50) DEFAULT 'admin',
-                    password VARCHAR(50) DEFAULT 'password'
+                    password VARCHAR(50) DEFAULT 'password',
+                    last_synced_ts INTEGER DEFAULT NULL
                 )
             ''')
+
+            # Terminals tables created before the last synced log time was tracked
+            try:
+                cursorNoble.execute('SELECT last_synced_ts FROM terminalsa LIMIT 1')
+                cursorNoble.fetchall()
+            except Exception:
+                cursorNoble.execute('ALTER TABLE terminalsa ADD COLUMN last_synced_ts INTEGER DEFAULT NULL')
+
+            # Partial index for getDevices, its predicate must stay identical to the query's active = '1'
+            cursorNoble.execute('''
+                CREATE INDEX IF NOT EXISTS idx_terminalsa_active
+                ON terminalsa(active) WHERE active = '1'
+            ''')
             
             # Sync log table
             cursorNoble.execute('''
@@ -121,14 +434,37 @@ class DatabaseManager:
                     timestamp TEXT NOT NULL
                 )
             ''')
+
+            # Indexes for the last-synced lookup and log de-duplication
+            cursorNoble.execute('''
+                CREATE INDEX IF NOT EXISTS idx_accesslogs_terminal_dt
+                ON accesslogs(terminalid, datetime DESC)
+            ''')
+            # Tables filled before the unique index existed may hold duplicates that would make
+            # creating it fail, keep the first copy of each (NULL cardids never collide)
+            if not self._noble_is_mysql:
+                cursorNoble.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_accesslogs_dedup'")
+                if not cursorNoble.fetchall():
+                    cursorNoble.execute('''
+                        DELETE FROM accesslogs WHERE EXISTS (
+                            SELECT 1 FROM accesslogs AS kept
+                            WHERE kept.terminalid = accesslogs.terminalid
+                            AND kept.datetime = accesslogs.datetime
+                            AND kept.cardid = accesslogs.cardid
+                            AND kept.rowid < accesslogs.rowid
+                        )
+                    ''')
+                    if cursorNoble.rowcount > 0:
+                        logger.warning("Removed %d duplicate access logs before indexing them", cursorNoble.rowcount)
+            cursorNoble.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_accesslogs_dedup
+                ON accesslogs(terminalid, datetime, cardid)
+            ''')
             connNoble.commit()
-        finally:
-            connNoble.close()
 
         # Initialize CMS Database (Users/Business)
-        connCMS = self.get_cms_connection()
-        try:
-            cursorCMS = self._get_cursor(connCMS, self.cmsConfig['type'])
+        with self._cms() as connCMS:
+            cursorCMS = self._cms_cursor(connCMS)
             
             # Student table
             cursorCMS.execute('''
@@ -183,75 +519,119 @@ class DatabaseManager:
                     syncedDevices TEXT DEFAULT '[]'
                 )
             ''')
+
+            # Indexes for the date-range filters and sync status lookups
+            cursorCMS.execute('''
+                CREATE INDEX IF NOT EXISTS idx_student_registration_date
+                ON student(registration_date)
+            ''')
+            cursorCMS.execute('''
+                CREATE INDEX IF NOT EXISTS idx_new_employee_app_date
+                ON new_employee(app_date)
+            ''')
+            cursorCMS.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_facetemplates_user
+                ON faceTemplates(userId, userType)
+            ''')
+
+            # Devices each face template has been synced to
+            cursorCMS.execute('''
+                CREATE TABLE IF NOT EXISTS faceTemplateSync (
+                    templateId INTEGER NOT NULL,
+                    deviceName TEXT NOT NULL,
+                    syncedAt TEXT DEFAULT NULL,
+                    PRIMARY KEY (templateId, deviceName)
+                )
+            ''')
+
+            # Sync tables created before the sync time was recorded
+            try:
+                cursorCMS.execute('SELECT syncedAt FROM faceTemplateSync LIMIT 1')
+                cursorCMS.fetchall()
+            except Exception:
+                cursorCMS.execute('ALTER TABLE faceTemplateSync ADD COLUMN syncedAt TEXT DEFAULT NULL')
+
+            # Move sync status still held in the legacy faceTemplates.syncedDevices JSON column.
+            # Only SQLite is migrated, a MySQL CMS re-syncs legacy templates to their devices once.
+            # Malformed values are kept and reported so they can be repaired, once every valid row
+            # is moved startup only reads the column
+            if not self._cms_is_mysql:
+                cursorCMS.execute('''
+                    SELECT id, json_valid(syncedDevices) AS valid FROM faceTemplates
+                    WHERE syncedDevices IS NOT NULL AND syncedDevices != '[]'
+                ''')
+                legacy = cursorCMS.fetchall()
+                malformed = [row['id'] for row in legacy if not row['valid']]
+                if malformed:
+                    logger.warning("faceTemplates rows with malformed syncedDevices, not migrated: %s",
+                                   ", ".join(str(templateId) for templateId in malformed))
+                if len(malformed) < len(legacy):
+                    cursorCMS.execute('''
+                        INSERT OR IGNORE INTO faceTemplateSync (templateId, deviceName)
+                        SELECT faceTemplates.id, json_each.value
+                        FROM faceTemplates, json_each(faceTemplates.syncedDevices)
+                        WHERE faceTemplates.syncedDevices IS NOT NULL AND faceTemplates.syncedDevices != '[]'
+                        AND json_valid(faceTemplates.syncedDevices)
+                    ''')
+                    cursorCMS.execute('''
+                        UPDATE faceTemplates SET syncedDevices = '[]'
+                        WHERE syncedDevices IS NOT NULL AND syncedDevices != '[]'
+                        AND json_valid(syncedDevices)
+                    ''')
             connCMS.commit()
-        finally:
-            connCMS.close()
     
     def getUnsyncedUsers(self, startTime: Optional[int] = None, endTime: Optional[int] = None) -> List[Dict]:
         # Get users from both student_uat and new_employee_uat
-        conn = self.get_cms_connection()
-        cursor = self._get_cursor(conn, self.cmsConfig['type'])
-        
-        users = []
-        
-        # 1. Fetch Students
-        try:
-            # Need to handle date filtering if passed
-            query = 'SELECT matrix_no, name, registration_date FROM student'
-            params = []
-            
-            # Basic date filtering logic (simplified since format might vary in real DB)
-            # Assuming registration_date is stored as YYYY-MM-DD string
-            if startTime and endTime:
-                 start_dt = datetime.datetime.fromtimestamp(startTime).strftime('%Y-%m-%d')
-                 end_dt = datetime.datetime.fromtimestamp(endTime).strftime('%Y-%m-%d')
-                 query += ' WHERE registration_date BETWEEN ? AND ?'
-                 params = [start_dt, end_dt]
-            elif startTime:
-                 start_dt = datetime.datetime.fromtimestamp(startTime).strftime('%Y-%m-%d')
-                 query += ' WHERE registration_date >= ?'
-                 params = [start_dt]
-                 
-            cursor.execute(query, params)
-            for row in cursor.fetchall():
-                # Handle SQLite tuple vs MySQL dict cursor (if we switch later)
-                # For now assume tuple if SQLite, but let's be robust
-                if isinstance(row, dict):
-                     users.append({
+        with self._cms() as conn:
+            cursor = self._cms_stream_cursor(conn)
+
+            users = []
+
+            # 1. Fetch Students
+            try:
+                # Need to handle date filtering if passed
+                query = 'SELECT matrix_no, name, registration_date FROM student'
+                params = []
+
+                # Basic date filtering logic (simplified since format might vary in real DB)
+                # Assuming registration_date is stored as YYYY-MM-DD string
+                if startTime and endTime:
+                     start_dt = datetime.datetime.fromtimestamp(startTime).strftime('%Y-%m-%d')
+                     end_dt = datetime.datetime.fromtimestamp(endTime).strftime('%Y-%m-%d')
+                     query += ' WHERE registration_date BETWEEN ? AND ?'
+                     params = [start_dt, end_dt]
+                elif startTime:
+                     start_dt = datetime.datetime.fromtimestamp(startTime).strftime('%Y-%m-%d')
+                     query += ' WHERE registration_date >= ?'
+                     params = [start_dt]
+
+                cursor.execute(query, params)
+                for row in _iter_rows(cursor, self.STREAM_BATCH_SIZE):
+                    users.append({
                         "id": row['matrix_no'],
                         "name": row['name'],
                         "role": "student",
-                        "photoPath": "",
+                        "photoPath": "", # Dynamically determined later
                         "cardNumber": row['matrix_no'],
                         "registrationDate": row['registration_date']
                     })
-                else:
-                    users.append({
-                        "id": row[0], # matrix_no
-                        "name": row[1],
-                        "role": "student",
-                        "photoPath": "", # Dynamically determined later
-                        "cardNumber": row[0],
-                        "registrationDate": row[2]
-                    })
-        except Exception as e:
-            # Table might not exist yet or other error
-            # print(f"Error fetching students: {e}")
-            pass
-            
-        # 2. Fetch Employees
-        try:
-            query = 'SELECT id, name, empid, app_date FROM new_employee'
-            params = []
-            if startTime and endTime:
-                 start_dt = datetime.datetime.fromtimestamp(startTime).strftime('%Y-%m-%d')
-                 end_dt = datetime.datetime.fromtimestamp(endTime).strftime('%Y-%m-%d')
-                 query += ' WHERE app_date BETWEEN ? AND ?'
-                 params = [start_dt, end_dt]
-                 
-            cursor.execute(query, params)
-            for row in cursor.fetchall():
-                if isinstance(row, dict):
+            except Exception as e:
+                # Table might not exist yet or other error
+                # print(f"Error fetching students: {e}")
+                pass
+
+            # 2. Fetch Employees
+            try:
+                query = 'SELECT id, name, empid, app_date FROM new_employee'
+                params = []
+                if startTime and endTime:
+                     start_dt = datetime.datetime.fromtimestamp(startTime).strftime('%Y-%m-%d')
+                     end_dt = datetime.datetime.fromtimestamp(endTime).strftime('%Y-%m-%d')
+                     query += ' WHERE app_date BETWEEN ? AND ?'
+                     params = [start_dt, end_dt]
+
+                cursor.execute(query, params)
+                for row in _iter_rows(cursor, self.STREAM_BATCH_SIZE):
                     users.append({
                         "id": row['id'],
                         "name": row['name'],
@@ -260,304 +640,310 @@ class DatabaseManager:
                         "cardNumber": row['empid'],
                         "registrationDate": row['app_date']
                     })
-                else:
-                    users.append({
-                        "id": row[0],
-                        "name": row[1],
-                        "role": "employee",
-                        "photoPath": "",
-                        "cardNumber": row[2], # empid
-                        "registrationDate": row[3] # app_date
-                    })
-        except Exception:
-            pass
-        
-        conn.close()
+            except Exception:
+                pass
+
         return users
     
-    def getUnsyncedFaceTemplates(self) -> List[Dict]:
-        # Get face templates for all users by querying the appropriate year-based tables
-        conn = self.get_cms_connection()
-        if self.cmsConfig['type'] == "sqlite":
-            conn.row_factory = sqlite3.Row
-        
-        cursor = self._get_cursor(conn, self.cmsConfig['type'])
-        
-        templates = []
-        
-        # Get all users first to know where to look
-        all_users = self.getUnsyncedUsers()
-        
-        for user in all_users:
-            user_role = user["role"]
-            reg_date = user["registrationDate"]
-            
-            # Determine Year
-            try:
-                # Expecting YYYY-MM-DD or similar. Parse first 4 chars.
-                year = reg_date.strip()[:4]
-                if not year.isdigit():
+    def getUnsyncedFaceTemplates(self, users: Optional[List[Dict]] = None,
+                                 deviceNames: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+        # Yield face templates by querying the appropriate year-based tables.
+        # Callers that already hold the full user list pass it in to skip a second scan.
+        # With deviceNames, templates already on all of those devices are skipped before encoding.
+        if users is None:
+            users = self.getUnsyncedUsers()
+        targetDevices = frozenset(deviceNames) if deviceNames is not None else None
+
+        with self._cms() as conn:
+            cursor = self._cms_cursor(conn)
+
+            # Group users by (role, year) pic table to know where to look
+            all_users = []
+            groups = {}
+            for user in users:
+                # Determine Year
+                try:
+                    # Expecting YYYY-MM-DD or similar. Parse first 4 chars.
+                    year = user["registrationDate"].strip()[:4]
+                    if not year.isdigit():
+                        continue
+                except:
                     continue
-            except:
-                continue
-                
-            photo_data = None
-            
-            # Determine Table Name
-            if user_role == "student":
-                table_name = f"student_pic_{year}"
-                id_col = "matrix_no"
-            else:
-                table_name = f"new_employee_pic_{year}"
-                id_col = "empid"
-                
-            try:
-                query = f"SELECT pic_contents FROM {table_name} WHERE {id_col} = ?"
-                cursor.execute(query, (user["cardNumber"],))
-                row = cursor.fetchone()
-                if row:
-                    # Handle sqlite3.Row or tuple or dict
-                    if isinstance(row, dict):
-                        photo_data = row['pic_contents']
-                    elif isinstance(row, sqlite3.Row):
-                         photo_data = row['pic_contents']
-                    else:
-                        photo_data = row[0]
-            except Exception:
-                # Table for that year might not exist
-                continue
-                
-            if photo_data:
-                # Check sync status in faceTemplates table
-                # We use a composite key of userId + userType because IDs might collide between tables
-                cursor.execute('''
-                    SELECT id, syncedDevices FROM faceTemplates 
-                    WHERE userId = ? AND userType = ?
-                ''', (str(user["id"]), user_role))
-                
-                status_row = cursor.fetchone()
-                
-                synced_devices = []
-                template_id = None
-                
-                if status_row:
-                    if isinstance(status_row, dict) or isinstance(status_row, sqlite3.Row):
-                        template_id = status_row['id']
-                        synced_devices = json.loads(status_row['syncedDevices']) if status_row['syncedDevices'] else []
-                    else:
-                        template_id = status_row[0]
-                        synced_devices = json.loads(status_row[1]) if status_row[1] else []
+                all_users.append((user, year))
+                groups.setdefault((user["role"], year), []).append(user["cardNumber"])
+
+            # Fetch photos with one IN query per chunk of each pic table
+            photos = {}
+            for (user_role, year), cardNumbers in groups.items():
+                # Determine Table Name
+                if user_role == "student":
+                    table_name = f"student_pic_{year}"
+                    id_col = "matrix_no"
                 else:
-                    # Insert new tracking record
-                    cursor.execute('''
-                        INSERT INTO faceTemplates (userId, userType, tableYear, syncedDevices)
-                        VALUES (?, ?, ?, ?)
-                    ''', (str(user["id"]), user_role, year, '[]'))
-                    template_id = cursor.lastrowid
-                    conn.commit()
-                
-                # Convert blob to base64 string
-                import base64
+                    table_name = f"new_employee_pic_{year}"
+                    id_col = "empid"
+
+                try:
+                    for chunk in _chunked(cardNumbers, self.FETCH_CHUNK_SIZE):
+                        placeholders = ", ".join("?" * len(chunk))
+                        cursor.execute(
+                            f"SELECT {id_col}, pic_contents FROM {table_name} WHERE {id_col} IN ({placeholders})",
+                            chunk
+                        )
+                        for row in cursor.fetchall():
+                            # Keep the first photo per user, as a single-row lookup would
+                            photos.setdefault((user_role, year, row[id_col]), row['pic_contents'])
+                except Exception:
+                    # Table for that year might not exist
+                    continue
+
+            with_photo = [(user, year) for user, year in all_users
+                          if photos.get((user["role"], year, user["cardNumber"]))]
+
+            # Load sync status from faceTemplates in bulk
+            # We use a composite key of userId + userType because IDs might collide between tables
+            tracking = self._fetchFaceTemplateTracking(cursor, with_photo)
+
+            # Insert tracking records for new users in one transaction; rows another sync
+            # added meanwhile are skipped by ux_facetemplates_user and picked up by the re-select
+            missing = {}
+            for user, year in with_photo:
+                key = (str(user["id"]), user["role"])
+                if key not in tracking:
+                    missing.setdefault(key, year)
+            if missing:
+                cursor.executemany(self._sql_insert_ft,
+                                   [(userId, userType, year) for (userId, userType), year in missing.items()])
+                tracking.update(self._fetchFaceTemplateTracking(
+                    cursor, [(user, year) for user, year in with_photo
+                             if (str(user["id"]), user["role"]) in missing]
+                ))
+                conn.commit()
+
+            # Devices each template is already synced to, loaded in one pass
+            syncedByTemplate = defaultdict(set)
+            if targetDevices is None:
+                cursor.execute(_SQL_SELECT_TEMPLATE_SYNC)
+                syncRows = cursor.fetchall()
+            elif targetDevices:
+                placeholders = ", ".join("?" * len(targetDevices))
+                cursor.execute(_SQL_SELECT_TEMPLATE_SYNC_FOR.format(placeholders=placeholders), list(targetDevices))
+                syncRows = cursor.fetchall()
+            else:
+                syncRows = []
+            for row in syncRows:
+                syncedByTemplate[row['templateId']].add(row['deviceName'])
+
+            for user, year in with_photo:
+                photo_data = photos.pop((user["role"], year, user["cardNumber"]), None)
+                if photo_data is None:
+                    continue
+                template_id = tracking[(str(user["id"]), user["role"])]
+                syncedDevices = frozenset(syncedByTemplate.get(template_id, ()))
+                if targetDevices is not None and targetDevices <= syncedDevices:
+                    continue
+
+                # Convert blob to base64 string, one template at a time
                 if isinstance(photo_data, bytes):
-                    photo_data_str = base64.b64encode(photo_data).decode('utf-8')
+                    photo_data_str = _b64encode(photo_data, newline=False).decode('ascii')
                 else:
                     photo_data_str = str(photo_data)
 
-                templates.append({
+                yield {
                     "id": template_id, # ID from faceTemplates tracking table
                     "userId": user["id"],
                     "userName": user["name"],
                     "faceTemplate": "", # Not used in this logic, assuming photo matches
                     "photoData": photo_data_str,
                     "enrollmentDate": user["registrationDate"],
-                    "syncedDevices": synced_devices
-                })
+                    "syncedDevices": syncedDevices # device names, O(1) lookups
+                }
+
+    def _fetchFaceTemplateTracking(self, cursor, users: List[tuple]) -> Dict[tuple, int]:
+        # Map (userId, userType) -> template id for the given (user, year) pairs
+        idsByType = {}
+        for user, _ in users:
+            idsByType.setdefault(user["role"], set()).add(str(user["id"]))
 
-        conn.close()
-        return templates
+        tracking = {}
+        for userType, userIds in idsByType.items():
+            for chunk in _chunked(sorted(userIds), self.FETCH_CHUNK_SIZE):
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(_SQL_SELECT_FT.format(placeholders=placeholders), [userType] + chunk)
+                for row in cursor.fetchall():
+                    tracking.setdefault((row['userId'], userType), row['id'])
+        return tracking
 
     def getDevices(self) -> List[Dict]:
         # Get active devices from terminalsa
-        conn = self.get_noble_connection()
-        if self.nobleConfig['type'] == "sqlite":
-            conn.row_factory = sqlite3.Row
-        cursor = self._get_cursor(conn, self.nobleConfig['type'])
-        
-        cursor.execute('''
-            SELECT * FROM terminalsa WHERE active = '1'
-        ''')
-        
-        devices = []
-        for row in cursor.fetchall():
-            if isinstance(row, sqlite3.Row):
-                devices.append(dict(row))
-            elif isinstance(row, dict):
-                devices.append(row)
-            else:
-                # Fallback if no row_factory/dict cursor, manual mapping would be needed
-                # But we are setting row_factory for sqlite, and dict cursor for mysql
-                pass
-            
-        conn.close()
+        with self._noble() as conn:
+            cursor = self._noble_cursor(conn)
+
+            # Only the row id (to tell devices apart) and the columns DeviceClient is built from
+            cursor.execute('''
+                SELECT id, terminalname, terminalid, ip, portno, username, password
+                FROM terminalsa WHERE active = '1'
+            ''')
+
+            row_to_dict = self._row_to_dict
+            devices = [row_to_dict(row) for row in cursor.fetchall()]
+
         return devices
     
-    def markFaceTemplateSynced(self, templateId: int, deviceName: str):
-        # Mark a face template as synced to a specific device
-        conn = self.get_cms_connection()
-        cursor = self._get_cursor(conn, self.cmsConfig['type'])
-        
-        # Get current synced devices
-        cursor.execute('SELECT syncedDevices FROM faceTemplates WHERE id = ?', (templateId,))
-        row = cursor.fetchone()
-        
-        val = None
-        if row:
-            if isinstance(row, dict) or isinstance(row, sqlite3.Row):
-                val = row['syncedDevices']
-            else:
-                val = row[0]
-                
-            syncedDevices = json.loads(val) if val else []
-            if deviceName not in syncedDevices:
-                syncedDevices.append(deviceName)
-                
-                cursor.execute('''
-                    UPDATE faceTemplates 
-                    SET syncedDevices = ?
-                    WHERE id = ?
-                ''', (json.dumps(syncedDevices), templateId))
-                
-                conn.commit()
-        
-        conn.close()
+    @_retryOnLocked
+    def markFaceTemplatesSyncedBulk(self, templateIds: List[int], deviceName: str):
+        # Mark many face templates as synced to one device in a single transaction
+        if not templateIds:
+            return
+        with self._cms() as conn:
+            cursor = self._cms_cursor(conn)
+            syncedAt = datetime.datetime.now().isoformat()
+            cursor.executemany(self._sql_mark_synced, [(templateId, deviceName, syncedAt) for templateId in templateIds])
+            conn.commit()
     
-    def saveDeviceAccessLogs(self, deviceClient: Any, logs: List[Dict]):
+    def saveDeviceAccessLogs(self, deviceClient: Any, logs: Iterable[Dict]) -> int:
         # Save access logs retrieved from devices into accesslogs_uat
-        if not logs:
+        # Logs may be a lazy stream from the device, only LOG_INSERT_ROWS of them are held at a time
+        logs = iter(logs)
+        chunk = list(islice(logs, self.LOG_INSERT_ROWS))
+        if not chunk:
             return 0
-        
-        conn = self.get_noble_connection()
-        cursor = self._get_cursor(conn, self.nobleConfig['type'])
-        
+
         savedCount = 0
+        with self._noble() as conn:
+            cursor = self._noble_cursor(conn)
+            # One transaction, a stream that breaks halfway must not move the high-water mark
+            self._begin_noble_write(cursor)
+            try:
+                while chunk:
+                    rows, lastTs = self._buildLogRows(deviceClient, chunk)
+                    savedCount += self._insertLogRows(cursor, deviceClient.terminalId, rows, lastTs)
+                    chunk = list(islice(logs, self.LOG_INSERT_ROWS))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        return savedCount
+
+    @_retryOnLocked
+    def saveAccessLogsBatch(self, batch: List[tuple]) -> List[int]:
+        # Save the logs of several (deviceClient, logs) pairs in one transaction, returns the saved count per pair
+        prepared = [self._buildLogRows(deviceClient, logs) for deviceClient, logs in batch]
+        if not any(rows for rows, _ in prepared):
+            return [0] * len(batch)
+
+        with self._noble() as conn:
+            cursor = self._noble_cursor(conn)
+            self._begin_noble_write(cursor)
+            counts = [self._insertLogRows(cursor, deviceClient.terminalId, rows, lastTs)
+                      for (deviceClient, _), (rows, lastTs) in zip(batch, prepared)]
+            conn.commit()
+
+        return counts
+
+    def _buildLogRows(self, deviceClient: Any, logs: List[Dict]) -> tuple:
+        # Map device log fields to accesslogs rows, returns (rows, newest timestamp)
+        terminal_id = deviceClient.terminalId
+        terminal_ip = deviceClient.ip
+
+        # Map fields for every log up front
+        rows = []
+        # One random prefix per batch plus a row counter keeps ids unique without a urandom call per log
+        idPrefix = os.urandom(12).hex()
+        lastTs = 0
+        # Logs without a CreateTime are stamped with the time of this batch
+        nowTs = int(time.time())
         for log in logs:
             try:
                 # Convert timestamp to datetime string
                 create_time = log.get('CreateTime')
-                if create_time:
-                    dt_str = datetime.datetime.fromtimestamp(int(create_time)).strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    dt_str = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                ts = int(create_time) if create_time else nowTs
+                # Logs arrive in bursts, so the formatted minute prefix is cached and only seconds vary
+                minute, second = divmod(ts, 60)
+                dt_str = f"{_log_minute_prefix(minute)}{second:02d}"
+                lastTs = max(lastTs, ts)
 
-                # Map fields
-                log_id = str(uuid.uuid4())
                 card_id = log.get('CardNo', '')
-                terminal_id = deviceClient.terminalId
-                terminal_ip = deviceClient.ip
                 door_id = str(log.get('Door', ''))
-                term_door = f"{terminal_id}:{door_id}"
-                
+
                 # Map Type (Entry/Exit)
                 log_type = log.get('Type', '')
                 in_out = 1 if log_type == 'Entry' else 2 if log_type == 'Exit' else 0
-                
-                verify_source = int(log.get('Method', 0))
-                verify_status = int(log.get('Status', 0))
-                user_id = log.get('UserID', '')
-
-                # Check for duplicates based on terminalid and datetime
-                cursor.execute('''
-                    SELECT id FROM accesslogs 
-                    WHERE terminalid = ? AND datetime = ? AND cardid = ?
-                ''', (terminal_id, dt_str, card_id))
-                
-                if cursor.fetchone():
-                    continue
 
-                cursor.execute('''
-                    INSERT INTO accesslogs 
-                    (id, cardid, datetime, terminalid, terminalip, doorid, termdoor, 
-                     in_out, verifysource, funckey, verifystatus, eventcode, userid)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    log_id,
+                rows.append((
+                    f"{idPrefix}{len(rows):08x}", # id
                     card_id,
                     dt_str,
                     terminal_id,
                     terminal_ip,
                     door_id,
-                    term_door,
+                    f"{terminal_id}:{door_id}", # termdoor
                     in_out,
-                    verify_source,
+                    int(log.get('Method', 0)), # verifysource
                     0, # funckey
-                    verify_status,
+                    int(log.get('Status', 0)), # verifystatus
                     '', # eventcode
-                    user_id
+                    log.get('UserID', '')
                 ))
-                
-                if cursor.rowcount > 0:
-                    savedCount += 1
-                    
             except Exception as e:
-                print(f"Error saving log: {e}")
-        
-        conn.commit()
-        conn.close()
+                logger.warning("Error saving log: %s", e)
+
+        return rows, lastTs
+
+    def _insertLogRows(self, cursor, terminal_id: str, rows: List[tuple], lastTs: int) -> int:
+        # Insert one device's rows on the caller's transaction, returns how many were new
+        if not rows:
+            return 0
+
+        # Duplicates (terminalid, datetime, cardid) hit the ux_accesslogs_dedup index and are
+        # skipped by the insert itself, rowcount only counts the rows that were stored
+        savedCount = 0
+        for chunk in _chunked(rows, self.LOG_INSERT_ROWS):
+            if len(chunk) == self.LOG_INSERT_ROWS:
+                sql = self._sql_insert_log_full
+            else:
+                sql = _multiRowSql(self._sql_insert_log, _SQL_LOG_ROW, len(chunk))
+            cursor.execute(sql, [value for row in chunk for value in row])
+            savedCount += cursor.rowcount
+        if savedCount <= 0:
+            return 0
+
+        # Keep the terminal's high-water mark in step with the stored logs
+        cursor.execute(_SQL_UPDATE_LAST_TS, (lastTs, terminal_id, lastTs))
+
         return savedCount
     
     def getLastSyncedLogTime(self, terminalId: str) -> Optional[int]:
-        # Get the last datetime synced from a device and convert to timestamp
-        conn = self.get_noble_connection()
-        cursor = self._get_cursor(conn, self.nobleConfig['type'])
-        
-        cursor.execute('''
-            SELECT MAX(datetime) 
-            FROM accesslogs 
-            WHERE terminalid = ?
-        ''', (terminalId,))
-        
-        row = cursor.fetchone()
-        result = None
-        if row:
-             if isinstance(row, dict) or isinstance(row, sqlite3.Row):
-                  pass # Handled below by trying index or values
-             else:
-                  result = row[0]
-        
-        # Let's retry with alias
-        if result is None:
-             cursor.execute('''
-                SELECT MAX(datetime) as max_dt
-                FROM accesslogs 
-                WHERE terminalid = ?
-            ''', (terminalId,))
-             row = cursor.fetchone()
-             if row:
-                if isinstance(row, dict) or isinstance(row, sqlite3.Row):
-                    result = row['max_dt']
-                else:
-                    result = row[0]
-        
-        conn.close()
-        
-        if result and result != '0000-00-00 00:00:00':
-            try:
-                dt = datetime.datetime.strptime(result, '%Y-%m-%d %H:%M:%S')
-                return int(dt.timestamp())
-            except:
+        # Get the last synced log time of a device as a timestamp
+        with self._noble() as conn:
+            cursor = self._noble_cursor(conn)
+
+            cursor.execute(_SQL_SELECT_LAST_TS, (terminalId,))
+            row = cursor.fetchone()
+            if row and row['last_synced_ts'] is not None:
+                return row['last_synced_ts']
+
+            # Not tracked yet (logs saved before last_synced_ts existed), derive it from the logs once
+            cursor.execute(self._sql_max_dt, (terminalId,))
+            row = cursor.fetchone()
+            dt = row['max_dt'] if row else None
+            if isinstance(dt, str):
+                # MySQL only converts real DATETIME columns, text columns come back as str
+                dt = _convert_datetime(dt)
+            if dt is None:
                 return None
-        return None
+            lastTs = int(dt.timestamp())
+
+            cursor.execute(_SQL_UPDATE_LAST_TS, (lastTs, terminalId, lastTs))
+            conn.commit()
+
+        return lastTs
     
     def logSyncOperation(self, syncType: str, deviceName: Optional[str], 
                         recordsSynced: int, status: str, errorMessage: Optional[str] = None):
-        # Log a sync operation
-        conn = self.get_noble_connection()
-        cursor = self._get_cursor(conn, self.nobleConfig['type'])
-        
-        cursor.execute('''
-            INSERT INTO syncLogs (syncType, deviceName, recordsSynced, status, errorMessage, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+        # Log a sync operation, buffered until the next flushSyncLogs
+        self._syncLogBuffer.append((
             syncType,
             deviceName,
             recordsSynced,
@@ -565,67 +951,109 @@ class DatabaseManager:
             errorMessage,
             datetime.datetime.now().isoformat()
         ))
-        
-        conn.commit()
-        conn.close()
+
+    def flushSyncLogs(self):
+        # Write all buffered sync logs in one transaction, kept for the next flush if that fails
+        rows = []
+        while self._syncLogBuffer:
+            try:
+                rows.append(self._syncLogBuffer.popleft())
+            except IndexError:
+                break
+        if not rows:
+            return
+
+        try:
+            with self._noble() as conn:
+                cursor = self._noble_cursor(conn)
+                cursor.executemany(_SQL_INSERT_SYNC_LOG, rows)
+                conn.commit()
+        except Exception as e:
+            logger.warning("Could not write %d sync log entries: %s", len(rows), e)
+            self._syncLogBuffer.extendleft(reversed(rows))
 
 # CONFIGURATION
+@dataclass(frozen=True, slots=True)
 class Config:
-    # Load configuration
-    _config_parser = configparser.ConfigParser()
-    if os.path.exists('config.ini'):
-        _config_parser.read('config.ini')
-        if 'Database.Noble' not in _config_parser:
-             print("Warning: [Database.Noble] section missing in config.ini. Using defaults.")
-             _config_parser['Database.Noble'] = {}
-        if 'Database.CMS' not in _config_parser:
-             print("Warning: [Database.CMS] section missing in config.ini. Using defaults.")
-             _config_parser['Database.CMS'] = {}
-    else:
-        print("Warning: config.ini not found. Using defaults.")
-        _config_parser['Database.Noble'] = {}
-        _config_parser['Database.CMS'] = {}
-        _config_parser['API'] = {}
-    
-    _noble_section = _config_parser['Database.Noble']
-    _cms_section = _config_parser['Database.CMS']
-    _api_section = _config_parser['API'] if 'API' in _config_parser else {}
-
     # Noble Database configuration (Hardware/Logs)
-    NOBLE_DB_PATH = _noble_section.get('Path', "noble_mock.db")
-    NOBLE_DB_TYPE = _noble_section.get('Type', "sqlite")
-    
-    NOBLE_DB_CONFIG = {}
-    if NOBLE_DB_TYPE == 'mysql':
-        NOBLE_DB_CONFIG = {
-            'host': _noble_section.get('Host', 'localhost'),
-            'user': _noble_section.get('User', 'root'),
-            'password': _noble_section.get('Password', ''),
-            'database': _noble_section.get('Name', 'noble_dahnua')
-        }
+    noble_path: str = "noble_mock.db"
+    noble_type: str = "sqlite"
+    noble_config: Dict = field(default_factory=dict)
 
     # CMS Database configuration (Users/Business)
-    CMS_DB_PATH = _cms_section.get('Path', "cms_mock.db")
-    CMS_DB_TYPE = _cms_section.get('Type', "sqlite")
-    
-    CMS_DB_CONFIG = {}
-    if CMS_DB_TYPE == 'mysql':
-        CMS_DB_CONFIG = {
-            'host': _cms_section.get('Host', 'localhost'),
-            'user': _cms_section.get('User', 'root'),
-            'password': _cms_section.get('Password', ''),
-            'database': _cms_section.get('Name', 'cms_ora')
-        }
-    
+    cms_path: str = "cms_mock.db"
+    cms_type: str = "sqlite"
+    cms_config: Dict = field(default_factory=dict)
+
     # API Configuration
-    API_URL = _api_section.get('URL', '')
-    
+    api_url: str = ""
+    api_mock: bool = True
+    mock_delay_s: float = 0.1
+
     # Sync intervals (in seconds)
-    SYNC_USERS_INTERVAL = 300
-    SYNC_LOGS_INTERVAL = 86400
-    
+    sync_users_interval: int = 300
+    sync_logs_interval: int = 86400
+
     # Sync settings
-    MAX_RECORDS_PER_SYNC = 100
+    max_records_per_sync: int = 100
+    enroll_batch_size: int = 50
+    # Devices whose last log is more recent than this are not polled
+    min_log_window_seconds: int = 5
+
+def load_config(path: str = 'config.ini') -> Config:
+    # Load configuration once into an immutable Config
+    config_parser = configparser.ConfigParser()
+    if os.path.exists(path):
+        config_parser.read(path)
+        if 'Database.Noble' not in config_parser:
+             print(f"Warning: [Database.Noble] section missing in {path}. Using defaults.")
+             config_parser['Database.Noble'] = {}
+        if 'Database.CMS' not in config_parser:
+             print(f"Warning: [Database.CMS] section missing in {path}. Using defaults.")
+             config_parser['Database.CMS'] = {}
+    else:
+        print(f"Warning: {path} not found. Using defaults.")
+        config_parser['Database.Noble'] = {}
+        config_parser['Database.CMS'] = {}
+    if 'API' not in config_parser:
+        config_parser['API'] = {}
+
+    noble_section = config_parser['Database.Noble']
+    cms_section = config_parser['Database.CMS']
+    api_section = config_parser['API']
+
+    noble_type = noble_section.get('Type', "sqlite")
+    noble_config = {}
+    if noble_type == 'mysql':
+        noble_config = {
+            'host': noble_section.get('Host', 'localhost'),
+            'user': noble_section.get('User', 'root'),
+            'password': noble_section.get('Password', ''),
+            'database': noble_section.get('Name', 'noble_dahnua')
+        }
+
+    cms_type = cms_section.get('Type', "sqlite")
+    cms_config = {}
+    if cms_type == 'mysql':
+        cms_config = {
+            'host': cms_section.get('Host', 'localhost'),
+            'user': cms_section.get('User', 'root'),
+            'password': cms_section.get('Password', ''),
+            'database': cms_section.get('Name', 'cms_ora')
+        }
+
+    return Config(
+        noble_path=noble_section.get('Path', "noble_mock.db"),
+        noble_type=noble_type,
+        noble_config=noble_config,
+        cms_path=cms_section.get('Path', "cms_mock.db"),
+        cms_type=cms_type,
+        cms_config=cms_config,
+        api_url=api_section.get('URL', ''),
+        api_mock=api_section.getboolean('Mock', True),
+        mock_delay_s=api_section.getfloat('MockDelay', 0.1),
+        enroll_batch_size=config_parser.getint('Sync', 'EnrollBatchSize', fallback=50)
+    )
 
 # DATA MODELS
 @dataclass
@@ -660,10 +1088,41 @@ class AccessLog:
     deviceId: str
 
 # DEVICE CLIENT
+_DEVICE_DATE_FORMAT = "%Y%m%d %H%M%S"
+
+# records[<index>].<Field>=<value>, one per line in recordFinder responses
+_RECORD_LINE_RE = re.compile(r'^records\[(\d+)\]\.([^=\n]+)=(.*)$')
+
+def _validity_window(days: int = 365):
+    # Card validity period as device formatted strings, computed once per sync run
+    start = datetime.datetime.now()
+    end = start + datetime.timedelta(days=days)
+    return start.strftime(_DEVICE_DATE_FORMAT), end.strftime(_DEVICE_DATE_FORMAT)
+
+def _cardRecord(userData: Dict, validStart: str, validEnd: str) -> Dict:
+    # AccessControlCard fields of a user, shared by single and batch enrollment so both write the same record
+    return {
+        "CardName": userData["name"],
+        "CardNo": userData["cardNumber"] or "",
+        "UserID": str(userData["id"]),
+        "CardStatus": 0,
+        "CardType": 0,
+        "Password": "",
+        "Doors": [1],
+        "TimeSections": [1],
+        "ValidDateStart": validStart,
+        "ValidDateEnd": validEnd
+    }
+
 class DeviceClient:
     # Client for interacting with devices via their APIs
+    HTTP_TIMEOUT = 5
+    # CGI name -> method producing its mock response
+    _MOCK_DISPATCH = {"recordFinder.cgi": "_generateMockLogs"}
     
-    def __init__(self, deviceConfig: Dict):
+    def __init__(self, deviceConfig: Dict, config: Config):
+        self.config = config
+        self.configKey = self.deviceConfigKey(deviceConfig)
         self.name = deviceConfig.get("terminalname", "Unknown")
         self.terminalId = deviceConfig.get("terminalid", "")
         self.ip = deviceConfig.get("ip", "")
@@ -672,54 +1131,65 @@ class DeviceClient:
         self.password = deviceConfig.get("password", "password")
         
         # Use global API IP if configured, otherwise use device IP
-        target_ip = Config.API_URL if Config.API_URL else self.ip
-        self.baseUrl = f"http://{target_ip}:{self.port}"
+        self.baseUrl = f"http://{config.api_url or self.ip}:{self.port}"
         self.auth = (self.username, self.password)
+
+        # Keep-alive session so repeated calls to this device reuse the same socket
+        self._session = requests.Session()
+        self._session.auth = self.auth
+        self._session.mount("http://", HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        ))
+
+    @staticmethod
+    def deviceConfigKey(deviceConfig: Dict) -> tuple:
+        # Everything a client is built from, an unchanged key means the client can be reused
+        return tuple(deviceConfig.get(key) for key in
+                     ("terminalname", "terminalid", "ip", "portno", "username", "password"))
+
+    def close(self):
+        # Release the pooled keep-alive sockets of this device
+        self._session.close()
     
-    def enrollUser(self, userData: Dict) -> bool:
+    def enrollUser(self, userData: Dict, validStart: Optional[str] = None, validEnd: Optional[str] = None) -> bool:
         # Enroll a user on the device
         try:
+            if validStart is None or validEnd is None:
+                validStart, validEnd = _validity_window()
+
             # Convert user data to format
-            payload = {
-                "CardName": userData["name"],
-                "CardNo": userData["cardNumber"] or "",
-                "UserID": str(userData["id"]),
-                "CardStatus": 0,
-                "CardType": 0,
-                "Password": "",
-                "Doors": [1],
-                "TimeSections": [1],
-                "ValidDateStart": datetime.datetime.now().strftime("%Y%m%d %H%M%S"),
-                "ValidDateEnd": (datetime.datetime.now() + datetime.timedelta(days=365)).strftime("%Y%m%d %H%M%S")
-            }
+            payload = _cardRecord(userData, validStart, validEnd)
             
-            # Construct URL with key=value format
-            params = f"action=insert&name=AccessControlCard"
+            # Construct URL with key=value format, list values as key[i]=value
+            pairs = [("action", "insert"), ("name", "AccessControlCard")]
             for key, value in payload.items():
                 if isinstance(value, list):
-                    for i, item in enumerate(value):
-                        params += f"&{key}[{i}]={item}"
+                    pairs.extend((f"{key}[{i}]", item) for i, item in enumerate(value))
                 else:
-                    params += f"&{key}={value}"
-            
+                    pairs.append((key, value))
+
+            # Escape values (names may contain '&', '=' or spaces) but keep the [i] suffixes readable
+            params = urlencode(pairs, quote_via=quote, safe="[]")
             url = f"{self.baseUrl}/cgi-bin/recordUpdater.cgi?{params}"
             
             # In real implementation, this would be an actual HTTP request
             # For mock, we'll simulate success
-            print(f"  → Enrolling user {userData['name']} on {self.name}")
+            logger.debug("  → Enrolling user %s on %s", userData['name'], self.name)
             
             # Call API
             response = self.apiCall(url)
             
             if response:
-                print(f"  User enrolled successfully on {self.name}")
+                logger.debug("  User enrolled successfully on %s", self.name)
                 return True
             else:
-                print(f"  Failed to enroll user on {self.name}")
+                logger.warning("  Failed to enroll user on %s", self.name)
                 return False
                 
         except Exception as e:
-            print(f"  Error enrolling user on {self.name}: {e}")
+            logger.error("  Error enrolling user on %s: %s", self.name, e)
             return False
     
     def enrollFaceTemplate(self, faceTemplate: Dict) -> bool:
@@ -737,230 +1207,406 @@ class DeviceClient:
                 }
             }
             
-            print(f"  → Enrolling face template for user {faceTemplate['userName']} on {self.name}")
+            logger.debug("  → Enrolling face template for user %s on %s", faceTemplate['userName'], self.name)
             
             # Call API
             response = self.apiCall(url, method="POST", json=payload)
             
             if response:
-                print(f" Face template enrolled successfully on {self.name}")
+                logger.debug(" Face template enrolled successfully on %s", self.name)
                 return True
             else:
-                print(f" Failed to enroll face template on {self.name}")
+                logger.warning(" Failed to enroll face template on %s", self.name)
                 return False
                 
         except Exception as e:
-            print(f" Error enrolling face template on {self.name}: {e}")
+            logger.error(" Error enrolling face template on %s: %s", self.name, e)
             return False
+
+    def enrollUsersBatch(self, users: List[Dict], validStart: Optional[str] = None, validEnd: Optional[str] = None) -> int:
+        # Enroll users with one multi-record POST per enroll_batch_size users, returns how many were accepted
+        if validStart is None or validEnd is None:
+            validStart, validEnd = _validity_window()
+
+        # Same AccessControlCard records as enrollUser, several per request
+        url = f"{self.baseUrl}/cgi-bin/recordUpdater.cgi?action=insertMulti&name=AccessControlCard"
+        enrolled = 0
+        for chunk in _chunked(users, self.config.enroll_batch_size):
+            try:
+                payload = {"CardList": [_cardRecord(user, validStart, validEnd) for user in chunk]}
+
+                logger.debug("  → Enrolling %d users on %s", len(chunk), self.name)
+                if self.apiCall(url, method="POST", json=payload):
+                    enrolled += len(chunk)
+                    continue
+                logger.warning("  Failed to enroll %d users on %s, retrying one by one", len(chunk), self.name)
+            except Exception as e:
+                logger.error("  Error enrolling users on %s: %s, retrying one by one", self.name, e)
+
+            # Firmware without insertMulti (or a single bad record) rejects the whole batch
+            enrolled += sum(self.enrollUser(user, validStart, validEnd) for user in chunk)
+
+        return enrolled
+
+    def enrollFaceTemplatesBatch(self, faceTemplates: List[Dict]) -> List[Dict]:
+        # Enroll face templates with one multi-record POST per chunk, returns the templates that were accepted
+        url = f"{self.baseUrl}/cgi-bin/AccessFace.cgi?action=insertMulti"
+        enrolled = []
+        for chunk in _chunked(faceTemplates, self.config.enroll_batch_size):
+            try:
+                payload = {
+                    "FaceList": [{
+                        "UserID": str(faceTemplate["userId"]),
+                        "UserName": faceTemplate["userName"],
+                        "FaceData": [faceTemplate["faceTemplate"]] if faceTemplate.get("faceTemplate") else [],
+                        "PhotoData": [faceTemplate["photoData"]] if faceTemplate.get("photoData") else []
+                    } for faceTemplate in chunk]
+                }
+
+                logger.debug("  → Enrolling %d face templates on %s", len(chunk), self.name)
+                if self.apiCall(url, method="POST", json=payload):
+                    enrolled.extend(chunk)
+                    continue
+                logger.warning(" Failed to enroll %d face templates on %s, retrying one by one", len(chunk), self.name)
+            except Exception as e:
+                logger.error(" Error enrolling face templates on %s: %s, retrying one by one", self.name, e)
+
+            # Same fallback as enrollUsersBatch, FaceInfoManager takes one template per request
+            enrolled.extend(faceTemplate for faceTemplate in chunk if self.enrollFaceTemplate(faceTemplate))
+
+        return enrolled
     
     def getOfflineAccessLogs(self, startTime: Optional[int] = None, endTime: Optional[int] = None) -> List[Dict]:
         # Get offline access logs from device
         try:
-            params = "action=find&name=AccessControlCardRec"
-            params += f"&count={Config.MAX_RECORDS_PER_SYNC}"
-            
-            if startTime:
-                params += f"&StartTime={startTime}"
-            if endTime:
-                params += f"&EndTime={endTime}"
-            
-            url = f"{self.baseUrl}/cgi-bin/recordFinder.cgi?{params}"
-            
-            print(f" Fetching offline access logs from {self.name}")
-            print(f" Time range: {startTime} to {endTime}")
-            
-            # Call API
-            response = self.apiCall(url)
-            
-            if response:
-                # Parse key=value response into list of dictionaries
-                logs = self._parseKeyValueResponse(response)
-                print(f" Retrieved {len(logs)} logs from {self.name}")
-                return logs
-            else:
-                print(f" Failed to retrieve logs from {self.name}")
-                return []
+            logs = list(self.iterOfflineAccessLogs(startTime, endTime))
+            logger.debug(" Retrieved %d logs from %s", len(logs), self.name)
+            return logs
                 
         except Exception as e:
-            print(f" Error fetching logs from {self.name}: {e}")
+            logger.error(" Error fetching logs from %s: %s", self.name, e)
             return []
+
+    def iterOfflineAccessLogs(self, startTime: Optional[int] = None, endTime: Optional[int] = None) -> Iterator[Dict]:
+        # Yield offline access logs one record at a time as the response streams in, errors propagate
+        params = "action=find&name=AccessControlCardRec"
+        params += f"&count={self.config.max_records_per_sync}"
+        
+        if startTime:
+            params += f"&StartTime={startTime}"
+        if endTime:
+            params += f"&EndTime={endTime}"
+        
+        url = f"{self.baseUrl}/cgi-bin/recordFinder.cgi?{params}"
+        
+        logger.debug(" Fetching offline access logs from %s", self.name)
+        logger.debug(" Time range: %s to %s", startTime, endTime)
+        
+        # Parse key=value lines into one dictionary per record
+        yield from self._iterParseRecords(self._iterApiLines(url))
+
+    def _iterApiLines(self, url: str) -> Iterator[str]:
+        # GET a line based response without buffering the whole body
+        if self.config.api_mock:
+            response = self._mockApiCall(url)
+            if response:
+                yield from response.splitlines()
+            return
+
+        with self._session.get(url, timeout=self.HTTP_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                logger.warning(" Failed to retrieve logs from %s", self.name)
+                return
+            yield from response.iter_lines(decode_unicode=True)
     
+    def ping(self, timeout: float = 1) -> Optional[int]:
+        # HTTP status of a HEAD request to the device on its keep-alive session, None if unreachable
+        if self.config.api_mock:
+            self._mockApiCall(self.baseUrl)
+            return 200
+
+        try:
+            return self._session.head(self.baseUrl, timeout=timeout).status_code
+        except requests.RequestException as e:
+            logger.debug("Ping to %s failed: %s", self.name, e)
+            return None
+
     def apiCall(self, url: str, method: str = "GET", json: Optional[Dict] = None) -> Any:
-        # Actual implementation to be used later:
-        # try:
-        #     if method == "GET":
-        #         response = requests.get(url, auth=self.auth, timeout=10)
-        #     elif method == "POST":
-        #         response = requests.post(url, auth=self.auth, json=json, timeout=10)
-        #     
-        #     if response.status_code == 200:
-        #         return response.text
-        #     return None
-        # except Exception as e:
-        #     print(f"Request failed: {e}")
-        #     return None
-        return self._mockApiCall(url, method, json)
+        # Mock responses unless real device calls are enabled in config.ini ([API] Mock = false)
+        if self.config.api_mock:
+            return self._mockApiCall(url, method, json)
+
+        try:
+            if method == "POST":
+                response = self._session.post(url, json=json, timeout=self.HTTP_TIMEOUT)
+            else:
+                response = self._session.get(url, timeout=self.HTTP_TIMEOUT)
+
+            if response.status_code == 200:
+                return response.text
+            return None
+        except Exception as e:
+            logger.warning("Request failed: %s", e)
+            return None
 
     def _mockApiCall(self, url: str, method: str = "GET", json: Optional[Dict] = None) -> Any:
-        # Simulate network delay
-        time.sleep(0.1)
+        # Simulate network delay, MockDelay = 0 turns it off
+        if self.config.mock_delay_s > 0:
+            time.sleep(self.config.mock_delay_s)
         
-        # For GET requests to recordFinder, return mock data
-        if "recordFinder.cgi" in url:
-            return self._generateMockLogs()
-        # For other requests, simulate success
-        else:
-            return "OK"
+        # Endpoints with mock data are looked up by CGI name, all others simulate success
+        cgi = url.split('?', 1)[0].rsplit('/', 1)[-1]
+        generator = self._MOCK_DISPATCH.get(cgi)
+        if generator is not None:
+            return getattr(self, generator)()
+        return "OK"
     
     def _generateMockLogs(self) -> str:
         # Generate mock device logs
-        import random
-        
-        logs = []
-        for i in range(random.randint(5, 15)):
-            logs.extend([
-                f"records[{i}].RecNo={1000 + i}",
-                f"records[{i}].CreateTime={int(time.time()) - random.randint(0, 86400)}",
-                f"records[{i}].CardNo=CARD{random.randint(100, 999)}",
-                f"records[{i}].CardName=User{random.randint(1, 50)}",
-                f"records[{i}].UserID=User{random.randint(1, 50)}",
-                f"records[{i}].Type={'Entry' if random.random() > 0.3 else 'Exit'}",
-                f"records[{i}].Status={1 if random.random() > 0.1 else 0}",
-                f"records[{i}].Method={15 if random.random() > 0.5 else 1}",
-                f"records[{i}].Door=1",
-                f"records[{i}].ReaderID=reader{random.randint(1, 3)}"
-            ])
-        
-        response = [
-            f"totalCount={len(logs)//10}",
-            f"found={len(logs)//10}"
-        ]
-        response.extend(logs)
-        
-        return "\n".join(response)
+        # Draw every random field for all records up front, one call per field
+        n = random.randint(5, 15)
+        now = int(time.time())
+        ages = random.choices(range(0, 86401), k=n)
+        cards = random.choices(range(100, 1000), k=n)
+        names = random.choices(range(1, 51), k=n)
+        userIds = random.choices(range(1, 51), k=n)
+        types = random.choices(('Entry', 'Exit'), weights=(7, 3), k=n)
+        statuses = random.choices((1, 0), weights=(9, 1), k=n)
+        methods = random.choices((15, 1), k=n)
+        readers = random.choices(range(1, 4), k=n)
+
+        # Two header lines then one ten-line f-string per record
+        header = f"totalCount={n}\nfound={n}\n"
+        return header + "".join(
+            f"records[{i}].RecNo={1000 + i}\n"
+            f"records[{i}].CreateTime={now - ages[i]}\n"
+            f"records[{i}].CardNo=CARD{cards[i]}\n"
+            f"records[{i}].CardName=User{names[i]}\n"
+            f"records[{i}].UserID=User{userIds[i]}\n"
+            f"records[{i}].Type={types[i]}\n"
+            f"records[{i}].Status={statuses[i]}\n"
+            f"records[{i}].Method={methods[i]}\n"
+            f"records[{i}].Door=1\n"
+            f"records[{i}].ReaderID=reader{readers[i]}\n"
+            for i in range(n)
+        )
     
-    def _parseKeyValueResponse(self, response: str) -> List[Dict]:
-        # Parse key=value response format into list of dictionaries
-        lines = response.strip().split('\n')
-        
-        # Parse records
-        records = {}
+    def _iterParseRecords(self, lines: Iterable[str]) -> Iterator[Dict]:
+        # The device writes each record's fields together, so a record is complete
+        # as soon as a line with another index shows up, header lines like found=N don't match
+        record_idx = None
+        record = None
         for line in lines:
-            if '=' in line:
-                key, value = line.split('=', 1)
-                
-                # Parse array indices like records[0].RecNo
-                if key.startswith('records[') and '].' in key:
-                    # Extract index and field name
-                    start_idx = key.find('[') + 1
-                    end_idx = key.find(']')
-                    record_idx = int(key[start_idx:end_idx])
-                    field_name = key.split('.', 1)[1]
-                    
-                    # Initialize record if not exists
-                    if record_idx not in records:
-                        records[record_idx] = {}
-                    
-                    # Store value
-                    records[record_idx][field_name] = value
-        
-        # Convert to list
-        return list(records.values())
+            match = _RECORD_LINE_RE.match(line)
+            if match is None:
+                continue
+
+            idx = match.group(1)
+            if idx != record_idx:
+                if record is not None:
+                    yield record
+                record_idx = idx
+                record = {}
+
+            # Store value
+            record[match.group(2)] = match.group(3)
+
+        if record is not None:
+            yield record
 
 # SYNC MANAGER
 class SyncManager:
     # Manages synchronization between database and devices
+    # Devices are synced in parallel, each one mostly waits on its own HTTP round trips
+    MAX_DEVICE_WORKERS = 8
+    # Device rows rarely change, reload them at most once per minute unless forced
+    DEVICES_TTL = 60
+    WRITER_JOIN_TIMEOUT = 30
     
-    def __init__(self):
+    def __init__(self, config: Config):
+        self.config = config
         # Pass separate configs for Noble and CMS
         nobleConfig = {
-            'type': Config.NOBLE_DB_TYPE,
-            'path': Config.NOBLE_DB_PATH,
-            'config': Config.NOBLE_DB_CONFIG
+            'type': config.noble_type,
+            'path': config.noble_path,
+            'config': config.noble_config
         }
         cmsConfig = {
-            'type': Config.CMS_DB_TYPE,
-            'path': Config.CMS_DB_PATH,
-            'config': Config.CMS_DB_CONFIG
+            'type': config.cms_type,
+            'path': config.cms_path,
+            'config': config.cms_config
         }
         self.dbManager = DatabaseManager(nobleConfig, cmsConfig)
         self.deviceClients = [] # Will be loaded dynamically
+        # Clients by terminalsa row id, names are not unique so they are only a lookup index
+        self._clientsById: Dict[Any, DeviceClient] = {}
+        self._clientsByName: Dict[str, DeviceClient] = {}
+        self._devicesLoadedAt = None
+        # Fetched logs waiting for the writer thread, None stops it
+        self._writeQueue = queue.Queue()
+        self._writerThread = None
         self.running = False
+        # Set by stop() to wake the service loop out of its sleep
+        self._stopEvent = threading.Event()
     
     def start(self):
         # Start the sync manager
         self.running = True
-        print("Starting Device Bridge Sync Manager")
-        print(f"Noble DB: {Config.NOBLE_DB_PATH}")
-        print(f"CMS DB: {Config.CMS_DB_PATH}")
+        self._stopEvent.clear()
+        logger.info("Starting Device Bridge Sync Manager")
+        logger.info("Noble DB: %s", self.config.noble_path)
+        logger.info("CMS DB: %s", self.config.cms_path)
         
         # Load devices
         self.refreshDevices()
-        print(f"Devices: {len(self.deviceClients)}")
-        print(f"Sync intervals: Users every {Config.SYNC_USERS_INTERVAL}s, Logs every {Config.SYNC_LOGS_INTERVAL}s")
-        print("=" * 60)
-        
-        # Schedule jobs -- SYNC_USERS_INTERVAL 300
-        schedule.every(Config.SYNC_USERS_INTERVAL).seconds.do(self.syncUsersToDevices)
-        schedule.every(Config.SYNC_LOGS_INTERVAL).seconds.do(self.syncLogsFromDevices)
+        self._startLogWriter()
+        logger.info("Devices: %d", len(self.deviceClients))
+        logger.info("Sync intervals: Users every %ds, Logs every %ds",
+                    self.config.sync_users_interval, self.config.sync_logs_interval)
         
         # Run initial sync
-        print("\nRunning initial sync...")
+        logger.info("Running initial sync...")
         self.syncUsersToDevices()
         self.syncLogsFromDevices()
         
-        # Keep running
+        # Keep running, sleeping until the next job is due, stop() interrupts the wait
+        nextUsers = time.monotonic() + self.config.sync_users_interval
+        nextLogs = time.monotonic() + self.config.sync_logs_interval
         while self.running:
-            schedule.run_pending()
-            time.sleep(1)
+            if self._stopEvent.wait(max(0, min(nextUsers, nextLogs) - time.monotonic())):
+                break
+            # The next run is due one interval after this one finishes
+            if time.monotonic() >= nextUsers:
+                self.syncUsersToDevices()
+                nextUsers = time.monotonic() + self.config.sync_users_interval
+            if time.monotonic() >= nextLogs:
+                self.syncLogsFromDevices()
+                nextLogs = time.monotonic() + self.config.sync_logs_interval
             
-    def refreshDevices(self):
+    def refreshDevices(self, force: bool = False):
         # Refresh device list from database
+        if (not force and self._devicesLoadedAt is not None
+                and time.monotonic() - self._devicesLoadedAt < self.DEVICES_TTL):
+            return
+
         devices = self.dbManager.getDevices()
-        self.deviceClients = [DeviceClient(d) for d in devices]
+
+        # Keep existing clients (and their open sessions) for devices whose config is unchanged.
+        # Keyed by row id so every active row gets its own client, even when names repeat
+        oldClients = self._clientsById
+        clientsById = {}
+        for device in devices:
+            rowId = device.get("id")
+            client = oldClients.get(rowId)
+            if client is None or client.configKey != DeviceClient.deviceConfigKey(device):
+                client = DeviceClient(device, self.config)
+            clientsById[rowId] = client
+
+        # Removed or reconfigured clients would otherwise keep their sockets open until garbage collected
+        for rowId, client in oldClients.items():
+            if clientsById.get(rowId) is not client:
+                client.close()
+
+        self._clientsById = clientsById
+        self.deviceClients = list(clientsById.values())
+        # Name lookup for getDeviceClient, the first row wins when names repeat
+        clientsByName = {}
+        for client in self.deviceClients:
+            clientsByName.setdefault(client.name, client)
+        self._clientsByName = clientsByName
+        self._devicesLoadedAt = time.monotonic()
+
+    def getDeviceClient(self, name: str) -> Optional[DeviceClient]:
+        # Client of a loaded device by name, None if there is no such active device
+        return self._clientsByName.get(name)
+
+    def invalidateDevices(self):
+        # Reload devices on the next refresh, e.g. after a sync error that may come from stale config
+        self._devicesLoadedAt = None
+
+    def pingDevices(self) -> List[Optional[int]]:
+        # HTTP status of every device (None if unreachable), probed concurrently, in device order
+        return self._forEachDevice(DeviceClient.ping)
+
+    def _forEachDevice(self, fn, *args) -> List:
+        # Run fn(deviceClient, *args) for every device concurrently, results in device order
+        if not self.deviceClients:
+            return []
+        workers = min(self.MAX_DEVICE_WORKERS, len(self.deviceClients))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="device-sync") as pool:
+            return list(pool.map(lambda deviceClient: fn(deviceClient, *args), self.deviceClients))
     
     def stop(self):
         # Stop the sync manager
         self.running = False
-        print("\nStopping sync manager...")
+        self._stopEvent.set()
+        logger.info("Stopping sync manager...")
+
+        # Let the writer save whatever was already fetched
+        if self._writerThread is not None:
+            self._writeQueue.put(None)
+            self._writerThread.join(timeout=self.WRITER_JOIN_TIMEOUT)
+            self._writerThread = None
+
+    def close(self):
+        # Release device sessions and database pools at shutdown
+        for client in self._clientsById.values():
+            client.close()
+        self._clientsById = {}
+        self._clientsByName = {}
+        self.deviceClients = []
+        self._devicesLoadedAt = None
+        self.dbManager.close()
     
     def syncUsersToDevices(self, startTime: Optional[int] = None, endTime: Optional[int] = None):
         # Sync users and face templates to all devices
-        print(f"\n[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Syncing users to devices...")
+        logger.info("Syncing users to devices...")
         
         try:
             # Get unsynced users and face templates
             users = self.dbManager.getUnsyncedUsers(startTime, endTime)
-            faceTemplates = self.dbManager.getUnsyncedFaceTemplates()
+
+            # Refresh devices if the cached list has expired, templates are filtered against them
+            self.refreshDevices()
+
+            # Templates cover all users, so the user scan is only shared when it was unfiltered.
+            # They are streamed a batch at a time, only one batch of encoded photos is held
+            faceTemplates = self.dbManager.getUnsyncedFaceTemplates(
+                None if startTime else users, [deviceClient.name for deviceClient in self.deviceClients])
+            batchSize = self.config.enroll_batch_size
+            chunk = list(islice(faceTemplates, batchSize))
+
+            # Nothing to push, skip the fan-out
+            if not users and not chunk:
+                self.dbManager.logSyncOperation(
+                    syncType="users_to_devices",
+                    deviceName=None,
+                    recordsSynced=0,
+                    status="success"
+                )
+                logger.info("Sync completed: nothing to sync")
+                return
+
+            # Same validity period for every user on every device in this run
+            validStart, validEnd = _validity_window()
+
+            # Sync users to all devices at once, a batch of records per request
+            usersByDevice = self._forEachDevice(DeviceClient.enrollUsersBatch, users, validStart, validEnd)
+
+            # Then each batch of templates, all devices at once
+            templatesByDevice = [0] * len(self.deviceClients)
+            while chunk:
+                counts = self._forEachDevice(self._syncTemplatesToDevice, chunk)
+                templatesByDevice = [total + count for total, count in zip(templatesByDevice, counts)]
+                chunk = list(islice(faceTemplates, batchSize))
             
+            # Report from this thread so per-device lines don't interleave
             totalUsersSynced = 0
             totalTemplatesSynced = 0
-            
-            # Refresh devices to ensure we have latest config
-            self.refreshDevices()
-            
-            # Sync to each device
-            for deviceClient in self.deviceClients:
-                print(f"\nSyncing to device: {deviceClient.name}")
-                
-                # Sync users
-                usersSynced = 0
-                for user in users:
-                    if deviceClient.enrollUser(user):
-                        usersSynced += 1
-                
-                # Sync face templates
-                templatesSynced = 0
-                for template in faceTemplates:
-                    if deviceClient.name not in template["syncedDevices"]:
-                        if deviceClient.enrollFaceTemplate(template):
-                            self.dbManager.markFaceTemplateSynced(template["id"], deviceClient.name)
-                            templatesSynced += 1
-                
+            for deviceClient, usersSynced, templatesSynced in zip(self.deviceClients, usersByDevice, templatesByDevice):
+                logger.info(" Device %s: %d users, %d face templates", deviceClient.name, usersSynced, templatesSynced)
                 totalUsersSynced += usersSynced
                 totalTemplatesSynced += templatesSynced
-                
-                print(f" Device {deviceClient.name}: {usersSynced} users, {templatesSynced} face templates")
             
             # Log sync operation
             self.dbManager.logSyncOperation(
@@ -970,11 +1616,12 @@ class SyncManager:
                 status="success"
             )
             
-            print(f"\nSync completed: {totalUsersSynced} users, {totalTemplatesSynced} face templates")
+            logger.info("Sync completed: %d users, %d face templates", totalUsersSynced, totalTemplatesSynced)
             
         except Exception as e:
             errorMsg = str(e)
-            print(f"Error during user sync: {errorMsg}")
+            logger.error("Error during user sync: %s", errorMsg)
+            self.invalidateDevices()
             self.dbManager.logSyncOperation(
                 syncType="users_to_devices",
                 deviceName=None,
@@ -982,80 +1629,129 @@ class SyncManager:
                 status="error",
                 errorMessage=errorMsg
             )
+        finally:
+            self.dbManager.flushSyncLogs()
     
+    def _syncTemplatesToDevice(self, deviceClient: DeviceClient, faceTemplates: List[Dict]) -> int:
+        # Push the templates of one batch that are not yet on this device, returns how many it accepted
+        pending = [t for t in faceTemplates if deviceClient.name not in t["syncedDevices"]]
+        syncedIds = [template["id"] for template in deviceClient.enrollFaceTemplatesBatch(pending)]
+        self.dbManager.markFaceTemplatesSyncedBulk(syncedIds, deviceClient.name)
+        return len(syncedIds)
+
     def syncLogsFromDevices(self):
         # Sync access logs from all devices
-        print(f"\n[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Syncing logs from devices...")
+        logger.info("Syncing logs from devices...")
         
-        totalLogsSaved = 0
-        
-        # Refresh devices
+        # Refresh devices if the cached list has expired
         self.refreshDevices()
         
-        for deviceClient in self.deviceClients:
-            # print(f"\nSyncing logs from device: {deviceClient.name}")
+        fetched = [(deviceClient, logs)
+                   for deviceClient, logs in zip(self.deviceClients, self._forEachDevice(self._fetchLogsFromDevice))
+                   if logs]
+        if fetched:
+            # While the service runs, the writer thread owns all log inserts
+            writer = self._writerThread
+            if writer is not None and writer.is_alive():
+                self._writeQueue.put(fetched)
+            else:
+                self._saveFetchedLogs(fetched)
+
+        # Fetch errors of this cycle are written together
+        self.dbManager.flushSyncLogs()
+
+    def _fetchLogsFromDevice(self, deviceClient: DeviceClient) -> List[Dict]:
+        # Pull new logs from one device, empty when there is nothing new or the device failed
+        try:
+            # Get last synced time
+            lastSyncedTime = self.dbManager.getLastSyncedLogTime(deviceClient.terminalId)
+            currentTime = int(time.time())
+
+            # Nothing can be new in a window this short, skip the request
+            if currentTime - (lastSyncedTime or 0) < self.config.min_log_window_seconds:
+                return []
             
-            try:
-                # Get last synced time
-                lastSyncedTime = self.dbManager.getLastSyncedLogTime(deviceClient.terminalId)
-                currentTime = int(time.time())
-                
-                # Fetch logs from device
-                logs = deviceClient.getOfflineAccessLogs(
-                    startTime=lastSyncedTime,
-                    endTime=currentTime
-                )
+            # Fetch logs from device
+            return deviceClient.getOfflineAccessLogs(
+                startTime=lastSyncedTime,
+                endTime=currentTime
+            )
                 
-                # Save logs to database
-                if logs:
-                    savedCount = self.dbManager.saveDeviceAccessLogs(deviceClient, logs)
-                    totalLogsSaved += savedCount
-                    
-                    # Log sync operation
-                    self.dbManager.logSyncOperation(
-                        syncType="logs_from_device",
-                        deviceName=deviceClient.name,
-                        recordsSynced=savedCount,
-                        status="success"
-                    )
-                    
-                    print(f" Saved {savedCount} new logs from {deviceClient.name}")
-                else:
-                    # print(f" No new logs from {deviceClient.name}")
-                    pass
-                    
-            except Exception as e:
-                errorMsg = str(e)
-                print(f" Error syncing logs from {deviceClient.name}: {errorMsg}")
-                self.dbManager.logSyncOperation(
-                    syncType="logs_from_device",
-                    deviceName=deviceClient.name,
-                    recordsSynced=0,
-                    status="error",
-                    errorMessage=errorMsg
-                )
+        except Exception as e:
+            self._logDeviceError(deviceClient, e)
+        return []
+
+    def _saveFetchedLogs(self, fetched: List[tuple]) -> int:
+        # Save (deviceClient, logs) pairs in one transaction and record the outcome per device
+        try:
+            counts = self.dbManager.saveAccessLogsBatch(fetched)
+        except Exception as e:
+            for deviceClient, _ in fetched:
+                self._logDeviceError(deviceClient, e)
+            return 0
+
+        totalLogsSaved = 0
+        for (deviceClient, _), savedCount in zip(fetched, counts):
+            # Log sync operation
+            self.dbManager.logSyncOperation(
+                syncType="logs_from_device",
+                deviceName=deviceClient.name,
+                recordsSynced=savedCount,
+                status="success"
+            )
+            logger.info(" Saved %d new logs from %s", savedCount, deviceClient.name)
+            totalLogsSaved += savedCount
         
         if totalLogsSaved > 0:
-            print(f"\nLog sync completed: {totalLogsSaved} total logs saved")
+            logger.info("Log sync completed: %d total logs saved", totalLogsSaved)
+        return totalLogsSaved
+
+    def _logDeviceError(self, deviceClient: DeviceClient, error: Exception):
+        errorMsg = str(error)
+        logger.error(" Error syncing logs from %s: %s", deviceClient.name, errorMsg)
+        self.invalidateDevices()
+        self.dbManager.logSyncOperation(
+            syncType="logs_from_device",
+            deviceName=deviceClient.name,
+            recordsSynced=0,
+            status="error",
+            errorMessage=errorMsg
+        )
+
+    def _startLogWriter(self):
+        self._writerThread = threading.Thread(target=self._logWriterLoop, name="log-writer", daemon=True)
+        self._writerThread.start()
+
+    def _logWriterLoop(self):
+        # Single consumer, everything queued since the last pass is saved in one transaction
+        while True:
+            items = [self._writeQueue.get()]
+            while True:
+                try:
+                    items.append(self._writeQueue.get_nowait())
+                except queue.Empty:
+                    break
+
+            fetched = [pair for item in items if item is not None for pair in item]
+            if fetched:
+                self._saveFetchedLogs(fetched)
+                self.dbManager.flushSyncLogs()
+            if None in items:
+                break
 
 # CLI APPLICATION
 class BridgeCLI:
     # Command Line Interface for the Bridge
+    # How long shutdown waits for a sync cycle in progress before closing sessions and pools
+    SERVICE_JOIN_TIMEOUT = 60
     
     def __init__(self):
-        self.syncManager = SyncManager()
-        # Initialize dbManager same way as SyncManager for status checks
-        nobleConfig = {
-            'type': Config.NOBLE_DB_TYPE,
-            'path': Config.NOBLE_DB_PATH,
-            'config': Config.NOBLE_DB_CONFIG
-        }
-        cmsConfig = {
-            'type': Config.CMS_DB_TYPE,
-            'path': Config.CMS_DB_PATH,
-            'config': Config.CMS_DB_CONFIG
-        }
-        self.dbManager = DatabaseManager(nobleConfig, cmsConfig)
+        self.config = load_config()
+        self.syncManager = SyncManager(self.config)
+        # Status checks share the sync manager's pools
+        self.dbManager = self.syncManager.dbManager
+        # Set when the sync service should stop, the main thread waits on it
+        self._stopEvent = threading.Event()
         
     def run(self):
         # Run the CLI application
@@ -1079,81 +1775,76 @@ class BridgeCLI:
             self.manual_sync_logs(args.device)
         elif args.command == 'test':
             self.test_connections()
+
+        self.syncManager.close()
     
     def start_sync_service(self):
         # Start the sync service
-        print("Starting Bridge Sync Service...")
+        logger.info("Starting Bridge Sync Service...")
         
-        # Run in background thread
+        # Run in background thread, if the sync loop ever ends the main thread is released too
         def run_sync_manager():
-            self.syncManager.start()
+            try:
+                self.syncManager.start()
+            finally:
+                self._stopEvent.set()
         
+        self._stopEvent.clear()
         thread = threading.Thread(target=run_sync_manager, daemon=True)
         thread.start()
         
-        print("Sync service started. Press Ctrl+C to stop.")
+        logger.info("Sync service started. Press Ctrl+C to stop.")
         
+        # Block without polling until stopped, Ctrl+C interrupts the wait
         try:
-            while True:
-                time.sleep(1)
+            self._stopEvent.wait()
         except KeyboardInterrupt:
+            pass
+        finally:
             self.syncManager.stop()
-            print("\nSync service stopped.")
+            # run() closes the sessions and pools next, the sync thread must be done with them
+            thread.join(timeout=self.SERVICE_JOIN_TIMEOUT)
+            if thread.is_alive():
+                logger.warning("Sync thread still running after %ds, closing anyway", self.SERVICE_JOIN_TIMEOUT)
+            logger.info("Sync service stopped.")
     
     def stop_sync_service(self):
         # Stop the sync service
+        self._stopEvent.set()
         self.syncManager.stop()
     
     def show_status(self):
         # Show current status
         
         # Connect to CMS DB for user stats
-        connCMS = self.dbManager.get_cms_connection()
-        cursorCMS = connCMS.cursor()
-        
-        # Count records
-        try:
-            cursorCMS.execute('SELECT COUNT(*) FROM student')
-            studentCount = cursorCMS.fetchone()[0]
-        except Exception:
-            studentCount = "N/A"
+        with self.dbManager.get_conn("cms") as connCMS:
+            cursorCMS = connCMS.cursor()
 
-        try:
-            cursorCMS.execute('SELECT COUNT(*) FROM new_employee')
-            employeeCount = cursorCMS.fetchone()[0]
-        except Exception:
-            employeeCount = "N/A"
-        
-        try:
-            cursorCMS.execute('SELECT COUNT(*) FROM faceTemplates')
-            templateCount = cursorCMS.fetchone()[0]
-        except Exception:
-            templateCount = "N/A"
-            
-        connCMS.close()
+            # Count records in one round trip, per table only if one of them is missing
+            try:
+                cursorCMS.execute(_SQL_CMS_COUNTS)
+                studentCount, employeeCount, templateCount = cursorCMS.fetchone()
+            except Exception:
+                studentCount = self._countRows(cursorCMS, 'student', "N/A")
+                employeeCount = self._countRows(cursorCMS, 'new_employee', "N/A")
+                templateCount = self._countRows(cursorCMS, 'faceTemplates', "N/A")
         
         # Connect to Noble DB for system stats
-        connNoble = self.dbManager.get_noble_connection()
-        cursorNoble = connNoble.cursor()
-        
-        # Check if accesslogs exists
-        try:
-            cursorNoble.execute('SELECT COUNT(*) FROM accesslogs')
-            logCount = cursorNoble.fetchone()[0]
-        except Exception:
-            logCount = "N/A (table missing)"
-        
-        try:
-            cursorNoble.execute('SELECT COUNT(*) FROM syncLogs')
-            syncCount = cursorNoble.fetchone()[0]
-            
-            cursorNoble.execute('SELECT syncType, status, COUNT(*) FROM syncLogs GROUP BY syncType, status')
-            syncStats = cursorNoble.fetchall()
-        except Exception:
-            syncCount = "N/A"
-            syncStats = []
-        
-        connNoble.close()
+        with self.dbManager.get_conn("noble") as connNoble:
+            cursorNoble = connNoble.cursor()
+
+            try:
+                cursorNoble.execute(_SQL_NOBLE_COUNTS)
+                logCount, syncCount = cursorNoble.fetchone()
+            except Exception:
+                logCount = self._countRows(cursorNoble, 'accesslogs', "N/A (table missing)")
+                syncCount = self._countRows(cursorNoble, 'syncLogs', "N/A")
+
+            try:
+                cursorNoble.execute('SELECT syncType, status, COUNT(*) FROM syncLogs GROUP BY syncType, status')
+                syncStats = cursorNoble.fetchall()
+            except Exception:
+                syncStats = []
         
         print("=" * 60)
         print("BRIDGE STATUS")
@@ -1165,27 +1856,31 @@ class BridgeCLI:
         print(f" Access Logs: {logCount}")
         print(f" Sync Operations: {syncCount}")
         
-        # Refresh devices
-        self.syncManager.refreshDevices()
+        # Refresh devices, always from the database for status
+        self.syncManager.refreshDevices(force=True)
         print(f"\nConfigured Devices: {len(self.syncManager.deviceClients)}")
         for client in self.syncManager.deviceClients:
             # Check online status with a quick timeout (optional, for display only)
             print(f" - {client.name} ({client.ip}) : {client.baseUrl}")
         
         print(f"\nSync Intervals:")
-        print(f" Users to Devices: Every {Config.SYNC_USERS_INTERVAL} seconds")
-        print(f" Logs from Devices: Every {Config.SYNC_LOGS_INTERVAL} seconds")
+        print(f" Users to Devices: Every {self.config.sync_users_interval} seconds")
+        print(f" Logs from Devices: Every {self.config.sync_logs_interval} seconds")
         
         if syncStats:
             print(f"\nSync Statistics:")
             for row in syncStats:
-                # Handle tuple or dict/Row result
-                if isinstance(row, tuple):
-                    print(f" {row[0]}: {row[1]} ({row[2]} times)")
-                else: 
-                     # If using dict cursor (mysql)
-                     print(f" {row['syncType']}: {row['status']} ({row['COUNT(*)']} times)")
+                # Plain cursor rows: tuples on MySQL, sqlite3.Row on SQLite, both indexable
+                print(f" {row[0]}: {row[1]} ({row[2]} times)")
     
+    def _countRows(self, cursor, table: str, missing: str):
+        # COUNT(*) of a single table, `missing` when the table can't be read
+        try:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            return cursor.fetchone()[0]
+        except Exception:
+            return missing
+
     def manual_sync_users(self, deviceName: Optional[str] = None, startTime: Optional[int] = None, endTime: Optional[int] = None):
         # Manually sync users to devices
         print("Manually syncing users to devices...")
@@ -1193,21 +1888,28 @@ class BridgeCLI:
         if deviceName:
             # Sync to specific device
             self.syncManager.refreshDevices()
-            deviceClient = next((d for d in self.syncManager.deviceClients if d.name == deviceName), None)
+            deviceClient = self.syncManager.getDeviceClient(deviceName)
             if deviceClient:
                 # Get users and sync
                 users = self.dbManager.getUnsyncedUsers(startTime, endTime)
-                faceTemplates = self.dbManager.getUnsyncedFaceTemplates()
+                faceTemplates = self.dbManager.getUnsyncedFaceTemplates(None if startTime else users, [deviceName])
+                validStart, validEnd = _validity_window()
                 
-                for user in users:
-                    deviceClient.enrollUser(user)
+                # Same multi-record requests as the service sync, one round trip per batch
+                usersSynced = deviceClient.enrollUsersBatch(users, validStart, validEnd)
                 
-                for template in faceTemplates:
-                    if deviceName not in template["syncedDevices"]:
-                        deviceClient.enrollFaceTemplate(template)
-                        self.dbManager.markFaceTemplateSynced(template["id"], deviceName)
+                # Templates already on this device were dropped by the loader before encoding,
+                # the rest are pushed a batch at a time instead of all being held at once
+                templatesSynced = 0
+                chunk = list(islice(faceTemplates, self.config.enroll_batch_size))
+                while chunk:
+                    # Only templates the device accepted are marked as synced
+                    enrolled = deviceClient.enrollFaceTemplatesBatch(chunk)
+                    self.dbManager.markFaceTemplatesSyncedBulk([template["id"] for template in enrolled], deviceName)
+                    templatesSynced += len(enrolled)
+                    chunk = list(islice(faceTemplates, self.config.enroll_batch_size))
                 
-                print(f"Manual sync to {deviceName} completed.")
+                print(f"Manual sync to {deviceName} completed: {usersSynced} users, {templatesSynced} face templates.")
             else:
                 print(f"Device {deviceName} not found.")
         else:
@@ -1221,21 +1923,26 @@ class BridgeCLI:
         if deviceName:
             # Sync from specific device
             self.syncManager.refreshDevices()
-            deviceClient = next((d for d in self.syncManager.deviceClients if d.name == deviceName), None)
+            deviceClient = self.syncManager.getDeviceClient(deviceName)
             if deviceClient:
                 lastSyncedTime = self.dbManager.getLastSyncedLogTime(deviceClient.terminalId)
                 currentTime = int(time.time())
                 
-                logs = deviceClient.getOfflineAccessLogs(
+                # Stream records from the device straight into the insert chunks
+                logs = deviceClient.iterOfflineAccessLogs(
                     startTime=lastSyncedTime,
                     endTime=currentTime
                 )
                 
-                if logs:
+                try:
                     savedCount = self.dbManager.saveDeviceAccessLogs(deviceClient, logs)
-                    print(f"Saved {savedCount} logs from {deviceName}.")
+                except Exception as e:
+                    print(f"Error syncing logs from {deviceName}: {e}")
                 else:
-                    print(f"No new logs from {deviceName}.")
+                    if savedCount:
+                        print(f"Saved {savedCount} logs from {deviceName}.")
+                    else:
+                        print(f"No new logs from {deviceName}.")
             else:
                 print(f"Device {deviceName} not found.")
         else:
@@ -1246,26 +1953,33 @@ class BridgeCLI:
         # Test connections to devices
         print("Testing connections to devices...")
         
-        self.syncManager.refreshDevices()
-        for client in self.syncManager.deviceClients:
+        self.syncManager.refreshDevices(force=True)
+
+        # One HEAD request per device over its pooled session, all devices at once
+        try:
+            statuses = self.syncManager.pingDevices()
+        except Exception as e:
+            print(f"Connection test failed: {e}")
+            return
+
+        for client, status in zip(self.syncManager.deviceClients, statuses):
             print(f"\nTesting {client.name} ({client.ip}):")
+            print(f" Connecting to {client.baseUrl}...")
             
-            try:
-                # Try to connect (in real implementation, this would be an HTTP request)
-                url = f"http://{client.ip}:{client.port}"
-                print(f" Connecting to {url}...")
-                
-                # Simulate connection test
-                time.sleep(0.5)
-                
-                # Mock response
-                print(f" Connection successful")
+            if status is None:
+                print(" Connection failed: no response")
+            elif status == 401:
+                print(" Connection successful")
+                print(f" Authentication failed: {client.username}/{'*' * len(client.password)}")
+            else:
+                print(" Connection successful")
                 print(f" Authentication: {client.username}/{'*' * len(client.password)}")
-                
-            except Exception as e:
-                print(f" Connection failed: {e}")
 
 # MAIN ENTRY POINT
 if __name__ == "__main__":
+    # Command output stays in order with the log lines on stderr even when piped
+    sys.stdout.reconfigure(line_buffering=True)
+    # Sync progress is logged at INFO, BRIDGE_LOG=WARNING keeps only problems, DEBUG adds per-record detail
+    setupLogging(getattr(logging, os.environ.get('BRIDGE_LOG', 'INFO').upper(), logging.INFO))
     cli = BridgeCLI()
     cli.run()
@@ -13,7 +13,7 @@ echo "Found Python 3"
 # 2. Install Dependencies
 echo "Installing/Checking dependencies..."
 sudo apt update
-sudo apt install -y python3-requests python3-schedule
+sudo apt install -y python3-requests
 
 # 3. Setup Database if not exists
 if [ ! -f "mock.db" ]; then
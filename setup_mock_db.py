@@ -1,9 +1,18 @@
 import sqlite3
-import datetime
 import os
 import configparser
 import random
 
+def _tune(conn):
+    # Same journal settings as the bridge's connection pool, commits are grouped in the WAL
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+    """)
+
 def setup_mock_db():
     print("Setting up mock databases...")
 
@@ -36,11 +45,21 @@ def setup_mock_db():
         except Exception as e:
             print(f"Could not remove {cms_path}: {e}")
 
+    # WAL side files left by an unclean shutdown must not be replayed into the new databases
+    for path in (noble_path, cms_path):
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
     # --- Setup Noble Database (Terminals, Logs) ---
     print(f"Creating Noble DB at {noble_path}...")
     conn_noble = sqlite3.connect(noble_path)
+    _tune(conn_noble)
     cursor_noble = conn_noble.cursor()
 
+    # Schema in one transaction, mock data in a second, each taking the write lock once
+    cursor_noble.execute("BEGIN IMMEDIATE")
+
     # Terminal Table
     cursor_noble.execute('''
         CREATE TABLE IF NOT EXISTS terminalsa (
@@ -64,7 +83,8 @@ def setup_mock_db():
             logtotal INTEGER DEFAULT NULL,
             relaystatus INTEGER DEFAULT -1,
             username VARCHAR(50) DEFAULT 'admin',
-            password VARCHAR(50) DEFAULT 'password'
+            password VARCHAR(50) DEFAULT 'password',
+            last_synced_ts INTEGER DEFAULT NULL
         )
     ''')
 
@@ -100,6 +120,9 @@ def setup_mock_db():
         )
     ''')
 
+    conn_noble.commit()
+    cursor_noble.execute("BEGIN IMMEDIATE")
+
     # Insert Mock Terminals
     terminals = [
         (1, "Main Entrance", "1001", "192.168.1.201", "80", "1", "admin", "password"),
@@ -115,14 +138,33 @@ def setup_mock_db():
     except Exception as e:
         print(f"Error inserting terminals: {e}")
 
+    # Secondary indexes are built once after the bulk inserts instead of per inserted row
+    # Only active terminals are loaded by the bridge, index just those rows
+    cursor_noble.execute('''
+        CREATE INDEX IF NOT EXISTS idx_terminalsa_active
+        ON terminalsa(active) WHERE active = '1'
+    ''')
+    cursor_noble.execute('''
+        CREATE INDEX IF NOT EXISTS idx_accesslogs_terminal_dt
+        ON accesslogs(terminalid, datetime DESC)
+    ''')
+    cursor_noble.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_accesslogs_dedup
+        ON accesslogs(terminalid, datetime, cardid)
+    ''')
+
     conn_noble.commit()
     conn_noble.close()
 
     # --- Setup CMS Database (Users, Employees, Photos) ---
     print(f"Creating CMS DB at {cms_path}...")
     conn_cms = sqlite3.connect(cms_path)
+    _tune(conn_cms)
     cursor_cms = conn_cms.cursor()
 
+    # Same split as the Noble DB, schema first
+    cursor_cms.execute("BEGIN IMMEDIATE")
+
     # Student Table
     cursor_cms.execute('''
         CREATE TABLE IF NOT EXISTS student (
@@ -176,27 +218,38 @@ def setup_mock_db():
         )
     ''')
 
+    # Face Template Sync Table
+    cursor_cms.execute('''
+        CREATE TABLE IF NOT EXISTS faceTemplateSync (
+            templateId INTEGER NOT NULL,
+            deviceName TEXT NOT NULL,
+            syncedAt TEXT DEFAULT NULL,
+            PRIMARY KEY (templateId, deviceName)
+        )
+    ''')
+
+    conn_cms.commit()
+
+    # All mock users and photos go in with one explicit transaction
+    cursor_cms.execute("BEGIN IMMEDIATE")
+
     # Insert Random Students (Year 2002)
     num_students = random.randint(5, 10)
     print(f"Inserting {num_students} random students...")
-    student_data = []
-    student_pics = []
     
     # Add a few fixed ones for easier testing
     fixed_students = [
         ("Alice Smith", "U2002001", "2002-01-15"),
         ("Bob Jones", "U2002002", "2002-02-20")
     ]
-    for s in fixed_students:
-        student_data.append(s)
-        student_pics.append((s[1], b"fake_photo_blob_" + s[1].encode()))
-
-    for i in range(num_students):
-        name = f"Student_{i+1}_{random.randint(1000, 9999)}"
-        matrix_no = f"U2002{i+10:03d}"
-        reg_date = f"2002-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
-        student_data.append((name, matrix_no, reg_date))
-        student_pics.append((matrix_no, b"fake_photo_blob_" + matrix_no.encode()))
+    student_data = fixed_students + [
+        (f"Student_{i+1}_{random.randint(1000, 9999)}",
+         f"U2002{i+10:03d}",
+         f"2002-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}")
+        for i in range(num_students)
+    ]
+    # Photos are derived from the rows, executemany consumes them straight from the generator
+    student_pics = ((s[1], b"fake_photo_blob_" + s[1].encode()) for s in student_data)
 
     try:
         cursor_cms.executemany('''
@@ -215,22 +268,17 @@ def setup_mock_db():
     # Insert Random Employees (Year 2004)
     num_employees = random.randint(3, 8)
     print(f"Inserting {num_employees} random employees...")
-    employee_data = []
-    employee_pics = []
     
     fixed_employees = [
         ("David Wilson", "E1001", "2004-05-01"),
     ]
-    for e in fixed_employees:
-        employee_data.append(e)
-        employee_pics.append((e[1], b"fake_photo_blob_" + e[1].encode()))
-
-    for i in range(num_employees):
-        name = f"Employee_{i+1}_{random.randint(1000, 9999)}"
-        empid = f"E10{i+10:02d}"
-        join_date = f"2004-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
-        employee_data.append((name, empid, join_date))
-        employee_pics.append((empid, b"fake_photo_blob_" + empid.encode()))
+    employee_data = fixed_employees + [
+        (f"Employee_{i+1}_{random.randint(1000, 9999)}",
+         f"E10{i+10:02d}",
+         f"2004-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}")
+        for i in range(num_employees)
+    ]
+    employee_pics = ((e[1], b"fake_photo_blob_" + e[1].encode()) for e in employee_data)
 
     try:
         cursor_cms.executemany('''
@@ -246,6 +294,16 @@ def setup_mock_db():
     except Exception as e:
         print(f"Error inserting employees: {e}")
 
+    # Same as above, index the date-range filter columns once all users are in
+    cursor_cms.execute('''
+        CREATE INDEX IF NOT EXISTS idx_student_registration_date
+        ON student(registration_date)
+    ''')
+    cursor_cms.execute('''
+        CREATE INDEX IF NOT EXISTS idx_new_employee_app_date
+        ON new_employee(app_date)
+    ''')
+
     conn_cms.commit()
     conn_cms.close()
     
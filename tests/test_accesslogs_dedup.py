@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bridge
+
+
+class AccessLogsDedupTest(unittest.TestCase):
+    # initDatabase must cope with an accesslogs table filled before ux_accesslogs_dedup existed
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.noblePath = os.path.join(self.tmpDir.name, "noble.db")
+        self.cmsPath = os.path.join(self.tmpDir.name, "cms.db")
+
+        conn = sqlite3.connect(self.noblePath)
+        conn.execute('''
+            CREATE TABLE accesslogs (
+                id VARCHAR(48) NOT NULL PRIMARY KEY,
+                cardid VARCHAR(16) NOT NULL DEFAULT '',
+                datetime DATETIME NOT NULL DEFAULT '0000-00-00 00:00:00',
+                terminalid VARCHAR(8) NOT NULL DEFAULT ''
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO accesslogs (id, cardid, datetime, terminalid) VALUES (?, ?, ?, ?)",
+            [
+                ("log-1", "A100", "2024-01-01 08:00:00", "1001"),
+                ("log-2", "A100", "2024-01-01 08:00:00", "1001"),
+                ("log-3", "A100", "2024-01-01 08:00:00", "1001"),
+                ("log-4", "A100", "2024-01-01 08:00:00", "1002"),
+                ("log-5", "B200", "2024-01-01 08:00:00", "1001"),
+            ])
+        conn.commit()
+        conn.close()
+
+        self.dbManager = bridge.DatabaseManager(
+            {"type": "sqlite", "path": self.noblePath},
+            {"type": "sqlite", "path": self.cmsPath})
+
+    def tearDown(self):
+        self.dbManager.close()
+        self.tmpDir.cleanup()
+
+    def _query(self, sql):
+        conn = sqlite3.connect(self.noblePath)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_duplicates_removed_keeping_first(self):
+        rows = self._query("SELECT id FROM accesslogs ORDER BY id")
+        self.assertEqual([row[0] for row in rows], ["log-1", "log-4", "log-5"])
+
+    def test_unique_index_created(self):
+        rows = self._query("SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'ux_accesslogs_dedup'")
+        self.assertEqual(len(rows), 1)
+
+    def test_reinit_keeps_rows(self):
+        self.dbManager.initDatabase()
+        self.assertEqual(self._query("SELECT COUNT(*) FROM accesslogs")[0][0], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()